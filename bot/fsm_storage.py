@@ -0,0 +1,114 @@
+"""Persistent FSM storage — keeps aiogram state/data in the ``fsm_states`` table.
+
+State and data live in one row, so the state filter and the handler's
+``get_data()`` are served by a single SELECT. ``update_data()`` merges its
+keys into the row locked with ``SELECT … FOR UPDATE`` and writes it back
+with one UPSERT, in one transaction. Nothing is cached between updates: with several replicas any
+of them may get the user's next update, and a process-local copy of the row
+would serve a stale state and let ``update_data()`` drop keys written
+elsewhere. Within one update ``FsmBufferMiddleware`` keeps what was read.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from typing import Any, Mapping, NamedTuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import select
+
+from db.base import async_session, engine, upsert
+from db.models import FsmRecord
+
+logger = logging.getLogger(__name__)
+
+
+class _Record(NamedTuple):
+    state: str | None
+    data: dict[str, Any]
+
+
+class DbStorage(BaseStorage):
+    """aiogram storage backed by ``db.base.engine``."""
+
+    def __init__(self) -> None:
+        self._key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        # SQLite runs the SELECT outside a transaction, so FOR UPDATE protects
+        # nothing there; an SQLite database only serves one process anyway
+        self._write_lock = asyncio.Lock() if engine.dialect.name == "sqlite" else contextlib.nullcontext()
+
+    # ------------------------------------------------------------------
+    # BaseStorage API
+    # ------------------------------------------------------------------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self.set_record(key, state=state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self.set_record(key, data=data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return (await self._load(key)).data
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        await self.set_record(key, merge=data)
+        return (await self._load(key)).data
+
+    async def close(self) -> None:
+        pass
+
+    # ------------------------------------------------------------------
+    # Extensions
+    # ------------------------------------------------------------------
+
+    _UNSET: Any = object()
+
+    async def set_record(
+        self,
+        key: StorageKey,
+        state: StateType = _UNSET,
+        data: Mapping[str, Any] | None = None,
+        merge: Mapping[str, Any] | None = None,
+    ) -> None:
+        """Write state and/or data for ``key`` in a single UPSERT.
+
+        ``data`` replaces the stored dict; ``merge`` only sets its keys and
+        keeps the rest, with the row locked while it is read and rewritten so
+        a concurrent update of the same user (on any replica) isn't lost.
+        """
+        values: dict[str, Any] = {}
+        if state is not self._UNSET:
+            values["state"] = state.state if isinstance(state, State) else state
+        if data is not None:
+            values["data"] = dict(data)
+        if not values and not merge:
+            return
+
+        db_key = self._key_builder.build(key)
+        async with self._write_lock, async_session() as session:
+            if merge:
+                stored = await session.scalar(
+                    select(FsmRecord.data).where(FsmRecord.key == db_key).with_for_update()
+                )
+                values["data"] = {**(stored or {}), **merge}
+            stmt = upsert(FsmRecord).values(key=db_key, **values)
+            stmt = stmt.on_conflict_do_update(index_elements=[FsmRecord.key], set_=values)
+            await session.execute(stmt)
+            await session.commit()
+
+    async def _load(self, key: StorageKey) -> _Record:
+        db_key = self._key_builder.build(key)
+        async with async_session() as session:
+            result = await session.execute(
+                select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == db_key)
+            )
+            row = result.one_or_none()
+
+        # A fresh dict every time: callers may mutate it freely
+        return _Record(row.state, dict(row.data or {})) if row else _Record(None, {})
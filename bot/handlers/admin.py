@@ -1,19 +1,21 @@
 """Admin panel handler — calendar-based slot management."""
 
-from datetime import datetime, timezone, date as dt_date
+import html
+from datetime import datetime, timedelta, timezone, date as dt_date
 
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
 
 from bot import texts, keyboards
 from bot.states.user_states import AdminFSM
-from bot.services.slot_service import SlotService
+from bot.services.booking_service import BookingService, HistoryCursor
+from bot.services.schedule_service import ScheduleError, ScheduleService, parse_schedule
+from bot.services.slot_service import SlotService, slot_now
 from config.settings import settings
-from db.models import Booking, User
+from db.models import BookingStatus, TariffType
 
 router = Router()
 
@@ -48,32 +50,38 @@ async def admin_menu(callback: CallbackQuery, state: FSMContext):
 #  CREATE SLOT — Calendar → Time Grid → Auto-create
 # ═══════════════════════════════════════════════════
 
+CALENDAR_PROMPT = "Выберите дату для добавления слота:\n<i>• есть свободные слоты, × всё занято</i>"
+
+
+async def _show_calendar(callback: CallbackQuery, session: AsyncSession, year: int, month: int):
+    occupancy = await SlotService(session).get_month_occupancy(year, month)
+    await callback.message.edit_text(
+        CALENDAR_PROMPT,
+        parse_mode="HTML",
+        reply_markup=keyboards.calendar_keyboard(year, month, occupancy),
+    )
+
+
 @router.callback_query(F.data == "admin:create_slot")
-async def start_create_slot(callback: CallbackQuery, state: FSMContext):
+async def start_create_slot(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Show inline calendar for current month."""
     if not _is_admin(callback.from_user.id):
         return
-    now = datetime.now()
+    now = slot_now()
     await state.set_state(AdminFSM.entering_slot_date)
-    await callback.message.edit_text(
-        "Выберите дату для добавления слота:",
-        reply_markup=keyboards.calendar_keyboard(now.year, now.month),
-    )
+    await _show_calendar(callback, session, now.year, now.month)
     await callback.answer()
 
 
 # Calendar navigation (< and >)
 @router.callback_query(F.data.startswith("cal:"), AdminFSM.entering_slot_date)
-async def calendar_nav(callback: CallbackQuery, state: FSMContext):
+async def calendar_nav(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     parts = callback.data.split(":")
     if len(parts) < 3 or parts[1] == "ignore":
         await callback.answer()
         return
     year, month = int(parts[1]), int(parts[2])
-    await callback.message.edit_text(
-        "Выберите дату для добавления слота:",
-        reply_markup=keyboards.calendar_keyboard(year, month),
-    )
+    await _show_calendar(callback, session, year, month)
     await callback.answer()
 
 
@@ -85,7 +93,7 @@ async def on_day_selected(callback: CallbackQuery, state: FSMContext, session: A
     selected_date = dt_date(year, month, day)
 
     # Check not in the past
-    today = datetime.now().date()
+    today = slot_now().date()
     if selected_date < today:
         await callback.answer("❌ Нельзя выбрать прошедшую дату", show_alert=True)
         return
@@ -121,7 +129,7 @@ async def on_time_selected(callback: CallbackQuery, state: FSMContext, session:
     dt = datetime.combine(selected_date, dt_time(hour, 0))
 
     # Check not in past
-    if dt < datetime.now():
+    if dt < slot_now():
         await callback.answer("❌ Это время уже прошло", show_alert=True)
         return
 
@@ -156,22 +164,46 @@ async def ignore_calendar_click(callback: CallbackQuery):
 #  DELETE SLOT
 # ═══════════════════════════════════════════════════
 
-@router.callback_query(F.data == "admin:delete_slot")
-async def start_delete_slot(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not _is_admin(callback.from_user.id):
-        return
+async def _show_delete_page(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    cursor: str | None = None,
+    backwards: bool = False,
+):
     slot_svc = SlotService(session)
-    slots = await slot_svc.get_future_slots()
-    if not slots:
+    page = await slot_svc.get_future_slots_page(keyboards.decode_cursor(cursor) if cursor else None, backwards)
+    if not page.slots and cursor:
+        # The page emptied (slots deleted or started) — back to the first one
+        cursor, backwards = None, False
+        page = await slot_svc.get_future_slots_page()
+    if not page.slots:
         await callback.answer(texts.ADMIN_NO_SLOTS, show_alert=True)
         return
+    # Remember the page so the list stays in place after a deletion
+    await state.update_data(slot_delete_page={"cursor": cursor, "backwards": backwards})
     await callback.message.edit_text(
         "Выберите слот для удаления:",
-        reply_markup=keyboards.admin_slot_delete_keyboard(slots),
+        reply_markup=keyboards.admin_slot_delete_keyboard(page),
     )
     await callback.answer()
 
 
+@router.callback_query(F.data == "admin:delete_slot")
+async def start_delete_slot(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    await _show_delete_page(callback, state, session)
+
+
+@router.callback_query(F.data.startswith("adel:"))
+async def delete_slot_page(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    _, direction, cursor = callback.data.split(":", 2)
+    await _show_delete_page(callback, state, session, cursor, backwards=direction == "prev")
+
+
 @router.callback_query(F.data.startswith("admin_del_slot:"))
 async def confirm_delete_slot(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     if not _is_admin(callback.from_user.id):
@@ -183,52 +215,202 @@ async def confirm_delete_slot(callback: CallbackQuery, state: FSMContext, sessio
         await callback.answer(texts.ADMIN_SLOT_DELETED, show_alert=True)
     else:
         await callback.answer("Не удалось удалить слот (уже забронирован).", show_alert=True)
-    # Refresh slot list
-    await start_delete_slot(callback, state, session)
+    # Refresh the current page of the slot list
+    anchor = (await state.get_data()).get("slot_delete_page") or {}
+    await _show_delete_page(callback, state, session, anchor.get("cursor"), anchor.get("backwards", False))
 
 
 # ═══════════════════════════════════════════════════
-#  LIST SLOTS
+#  RECURRING SCHEDULE — text → dry-run preview → bulk insert
 # ═══════════════════════════════════════════════════
 
-@router.callback_query(F.data == "admin:list_slots")
-async def list_slots(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@router.callback_query(F.data == "admin:schedule")
+async def start_schedule(callback: CallbackQuery, state: FSMContext):
     if not _is_admin(callback.from_user.id):
         return
+    await state.set_state(AdminFSM.entering_schedule)
+    await callback.message.edit_text(
+        texts.ADMIN_SCHEDULE_PROMPT, parse_mode="HTML", reply_markup=keyboards.admin_schedule_confirm_keyboard(0),
+    )
+    await callback.answer()
+
+
+@router.message(AdminFSM.entering_schedule, F.text)
+async def on_schedule_entered(message: Message, state: FSMContext, session: AsyncSession):
+    if not _is_admin(message.from_user.id):
+        return
+    try:
+        schedule = parse_schedule(message.text)
+    except ScheduleError as e:
+        await message.answer(f"❌ {e}")
+        return
+
+    plan = await ScheduleService(session).plan(schedule, settings.SLOT_HOLIDAYS)
+    await state.update_data(schedule_text=message.text)
+    await state.set_state(AdminFSM.confirming_schedule)
+    await message.answer(
+        texts.ADMIN_SCHEDULE_PREVIEW.format(
+            new=len(plan.new),
+            first=plan.new[0].strftime("%d.%m.%Y %H:%M") if plan.new else "—",
+            last=plan.new[-1].strftime("%d.%m.%Y %H:%M") if plan.new else "—",
+            conflicts=len(plan.conflicts),
+            holidays=len(plan.holidays),
+        ),
+        parse_mode="HTML",
+        reply_markup=keyboards.admin_schedule_confirm_keyboard(len(plan.new)),
+    )
+
+
+@router.callback_query(F.data == "schedule:apply", AdminFSM.confirming_schedule)
+async def on_schedule_apply(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    data = await state.get_data()
+    schedule = parse_schedule(data["schedule_text"])
+    # Conflicts are re-checked: slots may have changed since the preview
+    plan = await ScheduleService(session).apply(schedule, callback.from_user.id, settings.SLOT_HOLIDAYS)
+
+    await state.update_data(schedule_text=None)
+    await state.set_state(AdminFSM.main_menu)
+    await callback.message.edit_text(
+        texts.ADMIN_SCHEDULE_CREATED.format(new=len(plan.new), conflicts=len(plan.conflicts)),
+        reply_markup=keyboards.admin_menu_keyboard(),
+    )
+    await callback.answer()
+
+
+# ═══════════════════════════════════════════════════
+#  LIST SLOTS
+# ═══════════════════════════════════════════════════
+
+async def _show_free_slots(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    cursor: str | None = None,
+    backwards: bool = False,
+):
     slot_svc = SlotService(session)
-    slots = await slot_svc.get_available_slots()
-    if not slots:
+    page = await slot_svc.get_available_slots_page(keyboards.decode_cursor(cursor) if cursor else None, backwards)
+    if not page.slots and cursor:
+        # The page emptied (slots booked or started) — back to the first one
+        page = await slot_svc.get_available_slots_page()
+    if not page.slots:
         await callback.answer("Нет свободных слотов.", show_alert=True)
         return
+    # A page at a time: the whole list would not fit into one message
     lines = ["📋 <b>Свободные слоты:</b>\n"]
-    for s in slots:
+    for s in page.slots:
         lines.append(f"  • {s.datetime_utc.strftime('%d.%m.%Y %H:%M')} — {s.duration_minutes} мин")
-    await callback.message.edit_text("\n".join(lines), parse_mode="HTML", reply_markup=keyboards.admin_menu_keyboard())
+    await callback.message.edit_text(
+        "\n".join(lines), parse_mode="HTML", reply_markup=keyboards.admin_slot_list_keyboard(page),
+    )
     await callback.answer()
 
 
+@router.callback_query(F.data == "admin:list_slots")
+async def list_slots(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    await _show_free_slots(callback, session)
+
+
+@router.callback_query(F.data.startswith("alist:"))
+async def list_slots_page(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    _, direction, cursor = callback.data.split(":", 2)
+    await _show_free_slots(callback, session, cursor, backwards=direction == "prev")
+
+
 # ═══════════════════════════════════════════════════
 #  BOOKING HISTORY
 # ═══════════════════════════════════════════════════
 
-@router.callback_query(F.data == "admin:history")
-async def booking_history(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    if not _is_admin(callback.from_user.id):
-        return
-    result = await session.execute(
-        select(Booking).order_by(desc(Booking.created_at)).limit(20)
+HISTORY_PERIODS = {"all": None, "today": 0, "7d": 7, "30d": 30}  # period -> days back
+
+
+def _cycle(options, current):
+    options = list(options)
+    return options[(options.index(current) + 1) % len(options)]
+
+
+async def _show_history(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    cursor: HistoryCursor | None = None,
+    backwards: bool = False,
+):
+    data = await state.get_data()
+    filters = data.get("history_filters") or {"tariff": None, "status": None, "period": "all"}
+
+    since = None
+    days = HISTORY_PERIODS[filters["period"]]
+    if days is not None:
+        today = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+        since = today - timedelta(days=days)
+
+    page = await BookingService(session).get_history_page(
+        tariff=TariffType(filters["tariff"]) if filters["tariff"] else None,
+        status=BookingStatus(filters["status"]) if filters["status"] else None,
+        since=since,
+        cursor=cursor,
+        backwards=backwards,
     )
-    bookings = list(result.scalars().all())
-    if not bookings:
+    is_filtered = filters["tariff"] or filters["status"] or days is not None
+    if not page.bookings and not is_filtered and cursor is None:
         await callback.answer("Записей пока нет.", show_alert=True)
         return
 
-    lines = ["📊 <b>Последние записи:</b>\n"]
-    for b in bookings:
-        user = await session.get(User, b.user_id)
-        name = f"{user.first_name} {user.last_name}" if user else "—"
+    lines = ["📊 <b>История записей:</b>\n"]
+    for b in page.bookings:
+        name = f"{b.user.first_name} {b.user.last_name}" if b.user else "—"
+        slot_time = b.slot.datetime_utc.strftime("%d.%m %H:%M") if b.slot else "—"
         lines.append(
-            f"  • {b.created_at.strftime('%d.%m.%Y')} | {name} | {b.tariff.value} | {b.status.value}"
+            f"  • {b.created_at.strftime('%d.%m.%Y')} | {html.escape(name)} | {b.tariff.value} | "
+            f"{b.status.value} | слот {slot_time}"
         )
-    await callback.message.edit_text("\n".join(lines), parse_mode="HTML", reply_markup=keyboards.admin_menu_keyboard())
+    if not page.bookings:
+        lines.append("Ничего не найдено.")
+
+    await callback.message.edit_text(
+        "\n".join(lines),
+        parse_mode="HTML",
+        reply_markup=keyboards.admin_history_keyboard(
+            filters, keyboards.encode_cursor(page.prev_cursor), keyboards.encode_cursor(page.next_cursor),
+        ),
+    )
     await callback.answer()
+
+
+@router.callback_query(F.data == "admin:history")
+async def booking_history(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    await _show_history(callback, state, session)
+
+
+@router.callback_query(F.data.startswith("ahist:f:"))
+async def booking_history_filter(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    key = callback.data.split(":")[2]
+    data = await state.get_data()
+    filters = dict(data.get("history_filters") or {"tariff": None, "status": None, "period": "all"})
+    if key == "tariff":
+        filters["tariff"] = _cycle(keyboards.HISTORY_TARIFF_LABELS, filters["tariff"])
+    elif key == "status":
+        filters["status"] = _cycle(keyboards.HISTORY_STATUS_LABELS, filters["status"])
+    elif key == "period":
+        filters["period"] = _cycle(HISTORY_PERIODS, filters["period"])
+    await state.update_data(history_filters=filters)
+    # Filters changed — start from the newest page again
+    await _show_history(callback, state, session)
+
+
+@router.callback_query(F.data.startswith("ahist:next:") | F.data.startswith("ahist:prev:"))
+async def booking_history_page(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    if not _is_admin(callback.from_user.id):
+        return
+    _, direction, raw_cursor = callback.data.split(":", 2)
+    await _show_history(callback, state, session, keyboards.decode_cursor(raw_cursor), backwards=direction == "prev")
@@ -32,6 +32,7 @@ async def on_gender_selected(callback: CallbackQuery, state: FSMContext, session
         gender=gender,
         questionnaire_phase=phase,
         current_question_id=None,
+        questionnaire_version=None,
         questionnaire_answers={"q_gender": gender},
         multi_selected=[],
         question_history=[],
@@ -86,6 +86,7 @@ async def enter_weight(message: Message, state: FSMContext, session: AsyncSessio
         await state.update_data(
             questionnaire_phase="basic",
             questionnaire_index=0,
+            questionnaire_version=None,
             questionnaire_answers={},
             multi_selected=[],
             question_history=[],
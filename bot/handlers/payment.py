@@ -7,8 +7,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot import texts
 from bot.states.user_states import BookingFSM
-from bot.services.yookassa_service import YooKassaService
-from config.settings import settings
+from bot.services.payment_reconciler import payment_reconciler
+from bot.webhook_server import mark_payment_succeeded
 from db.models import Payment, PaymentStatus
 
 router = Router()
@@ -24,25 +24,28 @@ async def check_payment(callback: CallbackQuery, state: FSMContext, session: Asy
         await callback.answer("Ошибка: платёж не найден", show_alert=True)
         return
 
-    yk = YooKassaService(settings)
-    info = await yk.get_payment_info(yk_payment_id)
+    # Served from memory when a webhook or the reconciler has just seen this payment
+    info = await payment_reconciler.statuses.fetch(yk_payment_id)
 
     if not info:
         await callback.answer("Не удалось проверить статус оплаты. Попробуйте позже.", show_alert=True)
         return
 
     if info.get("status") == "succeeded" and info.get("paid"):
-        # Update payment in DB
-        payment = await session.get(Payment, payment_db_id)
-        if payment:
-            payment.status = PaymentStatus.succeeded
-            await session.commit()
+        # Update payment in DB (a no-op if the webhook got there first)
+        await mark_payment_succeeded(
+            session, yk_payment_id, (info.get("payment_method") or {}).get("type", "unknown"),
+        )
 
         await callback.message.edit_text(texts.PAYMENT_SUCCESS, parse_mode="HTML")
 
-        tariff = data.get("tariff")
         # Next step: intake (name)
         await state.set_state(BookingFSM.entering_first_name)
         await callback.message.answer(texts.ENTER_FIRST_NAME, parse_mode="HTML")
+        return
+
+    payment = await session.get(Payment, payment_db_id)
+    if info.get("status") == "canceled" or (payment and payment.status == PaymentStatus.cancelled):
+        await callback.answer(texts.PAYMENT_EXPIRED, show_alert=True)
     else:
         await callback.answer(texts.PAYMENT_PENDING, show_alert=True)
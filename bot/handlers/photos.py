@@ -1,8 +1,8 @@
 """Photo upload handler.
 
-Photos are saved to disk immediately but DB records are deferred
-until the booking is created (to avoid FK violations).
-File IDs are stored in FSM state.
+Photos go into the content-addressed photo store immediately but DB
+records are deferred until the booking is created (to avoid FK violations).
+File IDs and content hashes are stored in FSM state.
 """
 
 from aiogram import Router, F
@@ -12,11 +12,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot import texts, keyboards
 from bot.states.user_states import BookingFSM
+from bot.services.photo_service import PhotoDownload, download_photos
 from bot.services.slot_service import SlotService
-from config.settings import settings
-
-import aiofiles
-from pathlib import Path
 
 router = Router()
 
@@ -26,7 +23,6 @@ MAX_PHOTOS = 20
 @router.message(BookingFSM.uploading_photos, F.photo)
 async def on_photo(message: Message, state: FSMContext, session: AsyncSession, album: list[Message] | None = None):
     data = await state.get_data()
-    user_db_id = data.get("user_db_id", 0)
     photo_count = data.get("photo_count", 0)
     saved_photos: list = data.get("saved_photos", [])
 
@@ -34,38 +30,33 @@ async def on_photo(message: Message, state: FSMContext, session: AsyncSession, a
     # Otherwise, it's a single message, so we wrap it in a list
     messages = album if album else [message]
 
-    new_photos_count = 0
-
+    # Largest size of each photo; skip images this user has already sent
+    seen = {p.get("file_unique_id") for p in saved_photos}
+    to_download: list[PhotoDownload] = []
     for msg in messages:
-        if photo_count >= MAX_PHOTOS:
+        if photo_count + len(to_download) >= MAX_PHOTOS:
             break
-        
         if not msg.photo:
             continue
-
-        # Get the largest photo
         photo = msg.photo[-1]
+        if photo.file_unique_id in seen:
+            continue
+        seen.add(photo.file_unique_id)
+        to_download.append(PhotoDownload(photo.file_id, photo.file_unique_id))
 
-        # Download file to disk
-        bot = msg.bot
-        file = await bot.get_file(photo.file_id)
-        file_data = await bot.download_file(file.file_path)
-
-        filename = f"photo_{photo_count + 1}.jpg"
-        folder = Path(settings.UPLOAD_DIR) / str(user_db_id) / "pending"
-        folder.mkdir(parents=True, exist_ok=True)
-        file_path = folder / filename
-
-        async with aiofiles.open(file_path, "wb") as f:
-            await f.write(file_data.read())
+    # Whole album in parallel — about as long as a single photo
+    downloaded = await download_photos(message.bot, to_download)
 
-        # Track in FSM state
+    # Track in FSM state
+    for item in downloaded:
         saved_photos.append({
-            "file_path": str(file_path),
-            "telegram_file_id": photo.file_id,
+            "file_path": str(item.path),
+            "telegram_file_id": item.file_id,
+            "file_unique_id": item.file_unique_id,
+            "content_hash": item.content_hash,
         })
-        photo_count += 1
-        new_photos_count += 1
+    photo_count += len(downloaded)
+    new_photos_count = len(downloaded)
 
     await state.update_data(photo_count=photo_count, saved_photos=saved_photos)
     
@@ -93,9 +84,9 @@ async def on_photos_skip(callback: CallbackQuery, state: FSMContext, session: As
 
 async def _go_to_slots(message: Message, state: FSMContext, session: AsyncSession):
     slot_svc = SlotService(session)
-    available = await slot_svc.get_available_slots()
+    days, picker = await slot_svc.get_day_picker()
 
-    if not available:
+    if not days.days:
         await message.answer(texts.NO_SLOTS, parse_mode="HTML")
         return
 
@@ -103,5 +94,5 @@ async def _go_to_slots(message: Message, state: FSMContext, session: AsyncSessio
     await message.answer(
         texts.CHOOSE_SLOT,
         parse_mode="HTML",
-        reply_markup=keyboards.slot_keyboard(available),
+        reply_markup=picker,
     )
@@ -4,13 +4,14 @@ Features:
   - Edits the same message instead of sending new ones
   - ⬅️ Back button to return to previous question
   - Question history stack for navigation
+  - FSM data is buffered per update by FsmBufferMiddleware: ``get_data()``
+    returns the live dict, so answers/history are mutated in place and
+    written once when the handler returns
 """
 
 from __future__ import annotations
 
-import os
 import logging
-from pathlib import Path
 
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
@@ -18,95 +19,58 @@ from aiogram.fsm.context import FSMContext
 
 from bot import texts, keyboards
 from bot.states.user_states import BookingFSM
-from bot.services.questionnaire_engine import QuestionnaireEngine
+from bot.services.questionnaire_registry import (
+    QUESTIONNAIRE_MAP,
+    CompiledQuestionnaire,
+    registry,
+)
 
 logger = logging.getLogger(__name__)
 router = Router()
 
-# Base directory for questionnaire .md files
-QUESTIONNAIRES_DIR = Path(os.path.dirname(os.path.abspath(__file__))).parent.parent
 
-# Cache loaded engines
-_engines: dict[str, QuestionnaireEngine] = {}
-
-
-def _get_engine(name: str) -> QuestionnaireEngine:
-    if name not in _engines:
-        engine = QuestionnaireEngine()
-        engine.load(str(QUESTIONNAIRES_DIR / f"{name}.md"))
-        _engines[name] = engine
-    return _engines[name]
-
-
-QUESTIONNAIRE_MAP = {
-    "basic": "basic_questionnaire",
-    "ayurved_m": "ayurved_m_questionnaire",
-    "ayurved_j": "ayurved_j_questionnaire",
-}
+def _get_questionnaire(data: dict) -> CompiledQuestionnaire:
+    """Questionnaire of the user's current phase, pinned to the version they started on."""
+    phase = data.get("questionnaire_phase", "basic")
+    return registry.get(QUESTIONNAIRE_MAP[phase], data.get("questionnaire_version"))
 
 
 async def _show_question(target: Message | CallbackQuery, state: FSMContext, edit: bool = False) -> None:
     """Display the current question — either edit existing message or send new one."""
     data = await state.get_data()
-    phase = data.get("questionnaire_phase", "basic")
     q_id = data.get("current_question_id")
     history: list = data.get("question_history", [])
 
-    engine = _get_engine(QUESTIONNAIRE_MAP[phase])
+    questionnaire = _get_questionnaire(data)
+    engine = questionnaire.engine
 
     if not q_id:
         q = engine.get_first_question()
     else:
         q = engine.questions.get(q_id)
+        if not q:
+            logger.warning(
+                f"Question {q_id} is not in {questionnaire.name}@{questionnaire.version} "
+                f"(pinned {data.get('questionnaire_version')}): finishing the phase"
+            )
 
     if not q:
         await _finish_phase(target, state)
         return
 
-    await state.update_data(current_question_id=q.id)
+    await state.update_data(current_question_id=q.id, questionnaire_version=questionnaire.version)
 
     show_back = len(history) > 0
+    if q.q_type == "multi":
+        await state.update_data(multi_selected=[])
 
-    # Function to format options if they are long
-    def format_options(text: str, opts: list[str]) -> tuple[str, list[str] | None]:
-        # Check if any option is long (e.g. > 40 chars)
-        if any(len(o) > 40 for o in opts):
-            # Create numbered list in text
-            new_text = text + "\n"
-            labels = []
-            for i, o in enumerate(opts, 1):
-                new_text += f"\n{i}. {o}"
-                labels.append(str(i))
-            return new_text, labels
-        return text, None
+    rendered = questionnaire.renderer.render(q.id, show_back)
+    if not rendered:
+        return
 
     if edit and isinstance(target, CallbackQuery) and target.message:
-        msg = target.message
         try:
-            if q.q_type == "single":
-                text, labels = format_options(f"❓ {q.text}", q.options)
-                await msg.edit_text(
-                    text,
-                    reply_markup=keyboards.single_option_keyboard(
-                        q.options, show_back=show_back, labels=labels
-                    ),
-                )
-            elif q.q_type == "multi":
-                text, labels = format_options(f"❓ {q.text}", q.options)
-                await state.update_data(multi_selected=[])
-                await msg.edit_text(
-                    f"{text}\n\n{texts.QUESTIONNAIRE_MULTI_HINT}",
-                    reply_markup=keyboards.multi_option_keyboard(
-                        q.options, show_back=show_back, labels=labels
-                    ),
-                )
-            elif q.q_type == "text":
-                await msg.edit_text(f"❓ {q.text}\n\n{texts.QUESTIONNAIRE_TEXT_HINT}")
-            elif q.q_type == "info":
-                await msg.edit_text(
-                    f"ℹ️ {q.text}",
-                    reply_markup=keyboards.info_keyboard(show_back=show_back),
-                )
+            await target.message.edit_text(rendered.text, reply_markup=rendered.reply_markup)
             return
         except Exception:
             # If edit fails (e.g. message too old), fall through to send new
@@ -114,31 +78,7 @@ async def _show_question(target: Message | CallbackQuery, state: FSMContext, edi
 
     # Send new message
     msg_target = target if isinstance(target, Message) else target.message
-
-    if q.q_type == "single":
-        text, labels = format_options(f"❓ {q.text}", q.options)
-        await msg_target.answer(
-            text,
-            reply_markup=keyboards.single_option_keyboard(
-                q.options, show_back=show_back, labels=labels
-            ),
-        )
-    elif q.q_type == "multi":
-        text, labels = format_options(f"❓ {q.text}", q.options)
-        await state.update_data(multi_selected=[])
-        await msg_target.answer(
-            f"{text}\n\n{texts.QUESTIONNAIRE_MULTI_HINT}",
-            reply_markup=keyboards.multi_option_keyboard(
-                q.options, show_back=show_back, labels=labels
-            ),
-        )
-    elif q.q_type == "text":
-        await msg_target.answer(f"❓ {q.text}\n\n{texts.QUESTIONNAIRE_TEXT_HINT}")
-    elif q.q_type == "info":
-        await msg_target.answer(
-            f"ℹ️ {q.text}",
-            reply_markup=keyboards.info_keyboard(show_back=show_back),
-        )
+    await msg_target.answer(rendered.text, reply_markup=rendered.reply_markup)
 
 
 # --- Back button ---
@@ -173,9 +113,8 @@ async def on_single_answer(callback: CallbackQuery, state: FSMContext):
     idx = int(callback.data.split(":", 1)[1])
     data = await state.get_data()
     q_id = data.get("current_question_id")
-    phase = data.get("questionnaire_phase", "basic")
-    engine = _get_engine(QUESTIONNAIRE_MAP[phase])
-    q = engine.questions.get(q_id)
+    questionnaire = _get_questionnaire(data)
+    q = questionnaire.engine.questions.get(q_id)
     answer_value = q.options[idx] if q and idx < len(q.options) else str(idx)
 
     # Save answer and push current question to history
@@ -195,9 +134,8 @@ async def on_multi_toggle(callback: CallbackQuery, state: FSMContext):
     idx = int(callback.data.split(":", 1)[1])
     data = await state.get_data()
     q_id = data.get("current_question_id")
-    phase = data.get("questionnaire_phase", "basic")
-    engine = _get_engine(QUESTIONNAIRE_MAP[phase])
-    q = engine.questions.get(q_id)
+    questionnaire = _get_questionnaire(data)
+    q = questionnaire.engine.questions.get(q_id)
     option = q.options[idx] if q and idx < len(q.options) else str(idx)
 
     selected = set(data.get("multi_selected", []))
@@ -212,7 +150,9 @@ async def on_multi_toggle(callback: CallbackQuery, state: FSMContext):
 
     if q:
         await callback.message.edit_reply_markup(
-            reply_markup=keyboards.multi_option_keyboard(q.options, selected, show_back=show_back)
+            reply_markup=questionnaire.renderer.toggle(
+                q_id, callback.message.reply_markup, idx, selected, show_back=show_back
+            )
         )
     await callback.answer()
 
@@ -268,11 +208,10 @@ async def on_info_next(callback: CallbackQuery, state: FSMContext):
 
 async def _advance(target: Message | CallbackQuery, state: FSMContext, answer: str):
     data = await state.get_data()
-    phase = data.get("questionnaire_phase", "basic")
     q_id = data.get("current_question_id")
     answers = data.get("questionnaire_answers", {})
 
-    engine = _get_engine(QUESTIONNAIRE_MAP[phase])
+    engine = _get_questionnaire(data).engine
     next_q = engine.get_next_question(q_id, answer, answers)
 
     if next_q:
@@ -300,6 +239,7 @@ async def _finish_phase(target: Message | CallbackQuery, state: FSMContext):
         await state.update_data(
             questionnaire_phase=next_phase,
             current_question_id=None,
+            questionnaire_version=None,  # Pin the new phase on its first question
             question_history=[],  # Reset history for new phase
         )
         await msg_target.answer(f"📝 Переходим к аюрвед-опроснику...")
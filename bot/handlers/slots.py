@@ -1,21 +1,69 @@
 """Slot selection + booking confirmation handler."""
 
+from datetime import date, datetime, timezone
+
 from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from bot import texts, keyboards
 from bot.states.user_states import BookingFSM
 from bot.services.slot_service import SlotService
-from bot.services.booking_service import BookingService
+from bot.services.booking_finalizer import BookingFinalizer
 from bot.services.notification_service import NotificationService
-from db.models import User, QuestionnaireAnswer, Photo, TariffType
+from db.models import User, TariffType
 
 router = Router()
 
 
+def _parse_day(raw: str) -> date:
+    return datetime.strptime(raw, "%Y%m%d").date()
+
+
+# Paged picker: days with free slots -> free times of the chosen day
+
+async def _show_days(message: Message, session: AsyncSession, cursor: date | None = None, backwards: bool = False):
+    slot_svc = SlotService(session)
+    page, picker = await slot_svc.get_day_picker(cursor, backwards)
+    if not page.days and cursor:
+        page, picker = await slot_svc.get_day_picker()
+    if not page.days:
+        await message.edit_text(texts.NO_SLOTS, parse_mode="HTML")
+        return
+    await message.edit_text(texts.CHOOSE_SLOT, parse_mode="HTML", reply_markup=picker)
+
+
+@router.callback_query(F.data.startswith("sdays:"), BookingFSM.choosing_slot)
+async def on_days_page(callback: CallbackQuery, session: AsyncSession):
+    parts = callback.data.split(":")
+    if parts[1] == "first":
+        await _show_days(callback.message, session)
+    else:
+        await _show_days(callback.message, session, _parse_day(parts[2]), backwards=parts[1] == "prev")
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("sday:") | F.data.startswith("stimes:"), BookingFSM.choosing_slot)
+async def on_day_selected(callback: CallbackQuery, session: AsyncSession):
+    parts = callback.data.split(":", 3)
+    day = _parse_day(parts[1])
+    cursor = keyboards.decode_cursor(parts[3]) if len(parts) == 4 else None
+    backwards = len(parts) == 4 and parts[2] == "prev"
+
+    page, picker = await SlotService(session).get_time_picker(day, cursor, backwards)
+    if not page.slots:
+        await callback.answer("На этот день свободных слотов больше нет. Выберите другой.", show_alert=True)
+        await _show_days(callback.message, session)
+        return
+    await callback.message.edit_text(
+        f"{texts.CHOOSE_SLOT}\n\n📅 <b>{day.strftime('%d.%m.%Y')}</b>",
+        parse_mode="HTML",
+        reply_markup=picker,
+    )
+    await callback.answer()
+
+
 @router.callback_query(F.data.startswith("slot:"), BookingFSM.choosing_slot)
 async def on_slot_selected(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     slot_id = int(callback.data.split(":")[1])
@@ -24,7 +72,8 @@ async def on_slot_selected(callback: CallbackQuery, state: FSMContext, session:
     slot_svc = SlotService(session)
     slot = await slot_svc.get_slot_by_id(slot_id)
 
-    if not slot or slot.is_booked or slot.is_deleted:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if not slot or slot.is_booked or slot.is_deleted or slot.datetime_utc <= now:
         await callback.answer("Этот слот уже занят. Выберите другой.", show_alert=True)
         return
 
@@ -47,80 +96,27 @@ async def on_confirm(callback: CallbackQuery, state: FSMContext, session: AsyncS
     user_db_id = data.get("user_db_id")
     tariff = data.get("tariff")
 
-    # Book the slot
-    slot_svc = SlotService(session)
-    slot = await slot_svc.book_slot(slot_id)
-    if not slot:
-        await callback.answer("Слот уже занят!", show_alert=True)
-        return
-
-    # Create booking
-    booking_svc = BookingService(session)
-    booking = await booking_svc.create_booking(
+    # Slot, booking, answers and photos are written in one transaction
+    finalized = await BookingFinalizer(session).finalize(
         user_id=user_db_id,
         payment_id=payment_id,
         slot_id=slot_id,
         tariff=TariffType(tariff),
+        answers=data.get("questionnaire_answers", {}),
+        saved_photos=data.get("saved_photos", []),
     )
+    if not finalized:
+        await callback.answer("Слот уже занят!", show_alert=True)
+        return
+    booking = finalized.booking
+    slot = booking.slot
 
     await state.update_data(booking_id=booking.id)
 
-    # Save questionnaire answers to DB
-    answers_dict = data.get("questionnaire_answers", {})
-    phase = data.get("questionnaire_phase", "basic")
-    from bot.services.questionnaire_engine import QuestionnaireEngine
-    from bot.handlers.questionnaire import QUESTIONNAIRE_MAP, _get_engine
-
-    for q_id, answer_text in answers_dict.items():
-        # Determine questionnaire type
-        q_type = "basic"
-        for key, md_name in QUESTIONNAIRE_MAP.items():
-            engine = _get_engine(md_name)
-            if q_id in engine.questions:
-                q_type = key
-                q = engine.questions[q_id]
-                break
-        else:
-            q = None
-
-        qa = QuestionnaireAnswer(
-            booking_id=booking.id,
-            questionnaire_type=q_type,
-            question_id=q_id,
-            question_text=q.text if q else q_id,
-            answer=answer_text,
-        )
-        session.add(qa)
-
-    await session.commit()
-
-    # Save photos to DB now that booking exists
-    saved_photos = data.get("saved_photos", [])
-    for p in saved_photos:
-        photo_record = Photo(
-            booking_id=booking.id,
-            file_path=p["file_path"],
-            telegram_file_id=p.get("telegram_file_id"),
-        )
-        session.add(photo_record)
-    if saved_photos:
-        await session.commit()
-
-    # Load answers and photos for notification
-    user = await session.get(User, user_db_id)
-    answers_result = await session.execute(
-        select(QuestionnaireAnswer).where(QuestionnaireAnswer.booking_id == booking.id)
-    )
-    answers_list = list(answers_result.scalars().all())
-
-    photos_result = await session.execute(
-        select(Photo).where(Photo.booking_id == booking.id)
-    )
-    photos_list = list(photos_result.scalars().all())
-
     # Notify admins
+    user = await session.get(User, user_db_id)
     notifier = NotificationService(callback.bot)
-    await notifier.notify_new_booking(user, booking, answers_list, photos_list)
+    await notifier.notify_new_booking(user, booking, finalized.answers, finalized.photos)
 
     # Confirm to user
     dt = slot.datetime_utc
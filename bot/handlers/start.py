@@ -9,7 +9,7 @@ from sqlalchemy import select
 
 from bot import texts, keyboards
 from bot.states.user_states import BookingFSM
-from bot.services.yookassa_service import YooKassaService
+from bot.services.yookassa_service import get_yookassa
 from config.settings import settings
 from db.models import User, Payment, PaymentStatus, TariffType
 
@@ -66,7 +66,7 @@ async def on_tariff_selected(callback: CallbackQuery, state: FSMContext, session
     await session.refresh(payment)
 
     # Create YooKassa payment
-    yk = YooKassaService(settings)
+    yk = get_yookassa()
     tariff_label = texts.TARIFF_LABELS.get(tariff_key, tariff_key)
     yk_result = await yk.create_payment(
         amount=float(price),
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from datetime import datetime
 from typing import List
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -89,13 +90,67 @@ def photos_keyboard() -> InlineKeyboardMarkup:
     ])
 
 
-def slot_keyboard(slots) -> InlineKeyboardMarkup:
+# Keyset cursors in callback_data (Telegram limit is 64 bytes)
+
+def encode_cursor(cursor) -> str | None:
+    """``(datetime, id)`` -> ``"YYYYmmddHHMMSSffffff_id"``."""
+    if not cursor:
+        return None
+    created_at, row_id = cursor
+    return f"{created_at:%Y%m%d%H%M%S%f}_{row_id}"
+
+
+def decode_cursor(raw: str):
+    created_at, row_id = raw.split("_")
+    return datetime.strptime(created_at, "%Y%m%d%H%M%S%f"), int(row_id)
+
+
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+
+def _nav_row(prev_cb: str | None, next_cb: str | None) -> list[InlineKeyboardButton]:
+    row = []
+    if prev_cb:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=prev_cb))
+    if next_cb:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=next_cb))
+    return row
+
+
+def slot_days_keyboard(page) -> InlineKeyboardMarkup:
+    """Slot picker, step 1: days that have free slots (``SlotService.get_day_picker``)."""
     buttons = []
-    for slot in slots:
-        label = slot.datetime_utc.strftime("%d.%m.%Y %H:%M") + f" ({slot.duration_minutes} мин)"
-        buttons.append(
-            [InlineKeyboardButton(text=label, callback_data=f"slot:{slot.id}")]
-        )
+    for d in page.days:
+        label = f"📅 {WEEKDAYS[d.day.weekday()]} {d.day.strftime('%d.%m.%Y')} — свободно: {d.free}"
+        buttons.append([InlineKeyboardButton(text=label, callback_data=f"sday:{d.day:%Y%m%d}")])
+    nav = _nav_row(
+        f"sdays:prev:{page.prev_cursor:%Y%m%d}" if page.prev_cursor else None,
+        f"sdays:next:{page.next_cursor:%Y%m%d}" if page.next_cursor else None,
+    )
+    if nav:
+        buttons.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def slot_times_keyboard(day, page) -> InlineKeyboardMarkup:
+    """Slot picker, step 2: free times of one day (``SlotService.get_time_picker``)."""
+    buttons = []
+    row = []
+    for slot in page.slots:
+        label = slot.datetime_utc.strftime("%H:%M") + f" ({slot.duration_minutes} мин)"
+        row.append(InlineKeyboardButton(text=label, callback_data=f"slot:{slot.id}"))
+        if len(row) == 2:
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+    nav = _nav_row(
+        f"stimes:{day:%Y%m%d}:prev:{encode_cursor(page.prev_cursor)}" if page.prev_cursor else None,
+        f"stimes:{day:%Y%m%d}:next:{encode_cursor(page.next_cursor)}" if page.next_cursor else None,
+    )
+    if nav:
+        buttons.append(nav)
+    buttons.append([InlineKeyboardButton(text="⬅️ Другой день", callback_data="sdays:first")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
@@ -111,26 +166,58 @@ def confirm_booking_keyboard() -> InlineKeyboardMarkup:
 def admin_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="➕ Создать слот", callback_data="admin:create_slot")],
+        [InlineKeyboardButton(text="🗓 Слоты по расписанию", callback_data="admin:schedule")],
         [InlineKeyboardButton(text="🗑 Удалить слот", callback_data="admin:delete_slot")],
         [InlineKeyboardButton(text="📋 Свободные слоты", callback_data="admin:list_slots")],
         [InlineKeyboardButton(text="📊 История записей", callback_data="admin:history")],
     ])
 
 
-def admin_slot_delete_keyboard(slots) -> InlineKeyboardMarkup:
+def admin_schedule_confirm_keyboard(count: int) -> InlineKeyboardMarkup:
+    buttons = []
+    if count:
+        buttons.append([InlineKeyboardButton(text=f"✅ Создать {count} слот(ов)", callback_data="schedule:apply")])
+    buttons.append([InlineKeyboardButton(text="✏️ Изменить", callback_data="admin:schedule")])
+    buttons.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin:menu")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def admin_slot_delete_keyboard(page) -> InlineKeyboardMarkup:
     buttons = []
-    for slot in slots:
+    for slot in page.slots:
         status = "🟢" if not slot.is_booked else "🔴"
         label = f"{status} {slot.datetime_utc.strftime('%d.%m.%Y %H:%M')}"
         buttons.append(
             [InlineKeyboardButton(text=label, callback_data=f"admin_del_slot:{slot.id}")]
         )
+    nav = _nav_row(
+        f"adel:prev:{encode_cursor(page.prev_cursor)}" if page.prev_cursor else None,
+        f"adel:next:{encode_cursor(page.next_cursor)}" if page.next_cursor else None,
+    )
+    if nav:
+        buttons.append(nav)
+    buttons.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin:menu")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def admin_slot_list_keyboard(page) -> InlineKeyboardMarkup:
+    buttons = []
+    nav = _nav_row(
+        f"alist:prev:{encode_cursor(page.prev_cursor)}" if page.prev_cursor else None,
+        f"alist:next:{encode_cursor(page.next_cursor)}" if page.next_cursor else None,
+    )
+    if nav:
+        buttons.append(nav)
     buttons.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin:menu")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def calendar_keyboard(year: int, month: int) -> InlineKeyboardMarkup:
-    """Inline calendar for a given month — looks like a real calendar grid."""
+def calendar_keyboard(year: int, month: int, occupancy: dict | None = None) -> InlineKeyboardMarkup:
+    """Inline calendar for a given month — looks like a real calendar grid.
+
+    ``occupancy`` (``SlotService.get_month_occupancy``) marks days that have
+    free slots with • and fully booked days with ×.
+    """
     import calendar
 
     MONTH_NAMES = [
@@ -172,8 +259,14 @@ def calendar_keyboard(year: int, month: int) -> InlineKeyboardMarkup:
             if day == 0:
                 row.append(InlineKeyboardButton(text=" ", callback_data="cal:ignore"))
             else:
+                label = str(day)
+                cell = (occupancy or {}).get(day)
+                if cell and cell.free:
+                    label = f"•{day}"
+                elif cell and cell.booked:
+                    label = f"×{day}"
                 row.append(InlineKeyboardButton(
-                    text=str(day),
+                    text=label,
                     callback_data=f"cal_day:{year}:{month}:{day}",
                 ))
         buttons.append(row)
@@ -212,3 +305,36 @@ def time_grid_keyboard(
     buttons.append([InlineKeyboardButton(text="⬅️ Назад в админку", callback_data="admin:menu")])
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+HISTORY_TARIFF_LABELS = {None: "все", "basic": "Базовый", "extended": "Сопровождение", "repeat": "Повторная", "lite": "Лайт"}
+HISTORY_STATUS_LABELS = {None: "все", "active": "активные", "completed": "завершённые", "cancelled": "отменённые"}
+HISTORY_PERIOD_LABELS = {"all": "всё время", "today": "сегодня", "7d": "7 дней", "30d": "30 дней"}
+
+
+def admin_history_keyboard(
+    filters: dict,
+    prev_cursor: str | None = None,
+    next_cursor: str | None = None,
+) -> InlineKeyboardMarkup:
+    """Booking history: filter toggles (tap to cycle) + page navigation."""
+    buttons = [
+        [InlineKeyboardButton(
+            text=f"📦 Тариф: {HISTORY_TARIFF_LABELS[filters.get('tariff')]}", callback_data="ahist:f:tariff",
+        )],
+        [InlineKeyboardButton(
+            text=f"📌 Статус: {HISTORY_STATUS_LABELS[filters.get('status')]}", callback_data="ahist:f:status",
+        )],
+        [InlineKeyboardButton(
+            text=f"📅 Период: {HISTORY_PERIOD_LABELS[filters.get('period', 'all')]}", callback_data="ahist:f:period",
+        )],
+    ]
+    nav = []
+    if prev_cursor:
+        nav.append(InlineKeyboardButton(text="◀️ Новее", callback_data=f"ahist:prev:{prev_cursor}"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton(text="Старее ▶️", callback_data=f"ahist:next:{next_cursor}"))
+    if nav:
+        buttons.append(nav)
+    buttons.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin:menu")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
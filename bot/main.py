@@ -2,6 +2,7 @@
 
 import asyncio
 import logging
+import signal
 
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
@@ -10,10 +11,13 @@ from aiogram.enums import ParseMode
 from aiohttp import web
 
 from config.settings import settings
-from bot.middlewares import DbSessionMiddleware
+from bot.fsm_storage import DbStorage
+from bot.middlewares import DbSessionMiddleware, FsmBufferMiddleware
 from bot.handlers import start, payment, intake, questionnaire, photos, slots, admin
 from bot.handlers import gender
-from bot.webhook_server import create_webhook_app, set_bot_and_dp
+from bot.webhook_server import TelegramWebhookHandler, create_webhook_app, set_bot_and_dp, webhook_workers
+from bot.scheduler import CronTrigger, IntervalTrigger, local_timezone, scheduler
+from bot.services.yookassa_service import get_yookassa
 
 
 logging.basicConfig(
@@ -31,17 +35,29 @@ async def main():
         await conn.run_sync(Base.metadata.create_all)
     logger.info("Database tables ensured")
 
+    # Questionnaires: load the precompiled bundle now, not on the first user's click
+    from bot.services.questionnaire_registry import registry
+    registry.reload_interval = settings.QUESTIONNAIRE_RELOAD_INTERVAL
+    registry.load()
+
     bot = Bot(
         token=settings.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
-    dp = Dispatcher(storage=MemoryStorage())
+    if settings.FSM_STORAGE == "memory":
+        storage = MemoryStorage()
+    else:
+        storage = DbStorage()
+    dp = Dispatcher(storage=storage)
+    logger.info(f"FSM storage: {type(storage).__name__}")
 
-    # Middlewares
     # Middlewares
     dp.message.middleware(DbSessionMiddleware())
     dp.callback_query.middleware(DbSessionMiddleware())
+    # One FSM read + one FSM write per update
+    dp.message.middleware(FsmBufferMiddleware())
+    dp.callback_query.middleware(FsmBufferMiddleware())
 
     # Album middleware
     from bot.middlewares.album import AlbumMiddleware
@@ -59,15 +75,31 @@ async def main():
 
     # Share bot and dispatcher with webhook handler
     set_bot_and_dp(bot, dp)
+    if not settings.YOOKASSA_WEBHOOK_CHECK_IP and not settings.YOOKASSA_WEBHOOK_URL_TOKEN:
+        logger.warning(
+            "YooKassa webhook accepts notifications from any address: "
+            "set YOOKASSA_WEBHOOK_URL_TOKEN or YOOKASSA_WEBHOOK_CHECK_IP=true"
+        )
+    webhook_workers.workers = settings.WEBHOOK_WORKERS
+    await webhook_workers.start()
+
+    # Telegram updates: webhook on the same server, or long polling
+    telegram_webhook = None
+    if settings.TELEGRAM_WEBHOOK_URL:
+        telegram_webhook = TelegramWebhookHandler(
+            dp, bot,
+            max_concurrency=settings.TELEGRAM_WEBHOOK_CONCURRENCY,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET or None,
+        )
 
     # Start webhook server for YooKassa notifications
-    webhook_app = create_webhook_app()
+    webhook_app = create_webhook_app(telegram_webhook)
     webhook_port = int(getattr(settings, "WEBHOOK_PORT", 8080))
     runner = web.AppRunner(webhook_app)
     await runner.setup()
     site = web.TCPSite(runner, "0.0.0.0", webhook_port)
     await site.start()
-    logger.info(f"YooKassa webhook server started on port {webhook_port}")
+    logger.info(f"Webhook server started on port {webhook_port}")
 
     # Register bot menu commands
     from aiogram.types import BotCommand
@@ -77,12 +109,82 @@ async def main():
     ])
     logger.info("Bot commands registered")
 
-    # Start bot polling
+    # Background workers
+    from bot.services.conference_links import conference_links
+    from bot.services.delivery import delivery
+    from bot.services.slot_cache import slot_cache
+    delivery.start(bot)
+    await conference_links.start()
+    slot_cache.ttl = settings.SLOT_CACHE_TTL
+    if settings.DATABASE_URL.startswith("postgresql"):
+        # Other bot processes invalidate our slot cache via NOTIFY
+        await slot_cache.start_listener(settings.DATABASE_URL)
+    _schedule_jobs()
+    await scheduler.start()
+
     logger.info("Bot starting...")
     try:
-        await dp.start_polling(bot)
+        if telegram_webhook is None:
+            # getUpdates is refused while a webhook from an earlier deploy is set
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+        else:
+            await _serve_webhook(bot, dp, telegram_webhook)
     finally:
         await runner.cleanup()
+        await webhook_workers.stop()
+        await scheduler.stop(settings.SHUTDOWN_DRAIN_TIMEOUT)
+        await slot_cache.stop_listener()
+        await conference_links.stop()
+        await delivery.stop()
+        await get_yookassa().close()
+        if telegram_webhook is not None:
+            await bot.session.close()
+
+
+def _schedule_jobs() -> None:
+    """Periodic jobs; with several replicas only the scheduler leader runs them."""
+    from bot.services.payment_reconciler import payment_reconciler
+    from bot.services.photo_service import cleanup_photos
+    from bot.services.reminders import send_booking_reminders
+    from bot.webhook_server import purge_webhook_inbox
+
+    interval = settings.PAYMENT_RECONCILE_INTERVAL
+    scheduler.add_job("payment_reconcile", payment_reconciler.reconcile, IntervalTrigger(interval), jitter=interval / 10)
+    scheduler.add_job("payment_expire", payment_reconciler.expire, IntervalTrigger(interval), jitter=interval / 10)
+    scheduler.add_job(
+        "booking_reminders", send_booking_reminders,
+        IntervalTrigger(settings.BOOKING_REMINDER_INTERVAL), jitter=settings.BOOKING_REMINDER_INTERVAL / 10,
+    )
+    scheduler.add_job(
+        "photo_cleanup", cleanup_photos,
+        CronTrigger.parse(settings.PHOTO_CLEANUP_CRON, local_timezone()), jitter=60,
+    )
+    scheduler.add_job("webhook_inbox_cleanup", purge_webhook_inbox, IntervalTrigger(3600), jitter=360)
+
+
+async def _serve_webhook(bot: Bot, dp: Dispatcher, telegram_webhook: TelegramWebhookHandler) -> None:
+    """Register the webhook with Telegram and serve until SIGINT/SIGTERM, then drain."""
+    await bot.set_webhook(
+        settings.TELEGRAM_WEBHOOK_URL,
+        secret_token=settings.TELEGRAM_WEBHOOK_SECRET or None,
+        max_connections=settings.TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    await dp.emit_startup(bot=bot)
+    logger.info(f"Receiving Telegram updates at {settings.TELEGRAM_WEBHOOK_URL}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        # The webhook stays registered: other replicas keep receiving updates
+        logger.info("Shutting down, draining Telegram updates...")
+        await telegram_webhook.drain(settings.SHUTDOWN_DRAIN_TIMEOUT)
+        await dp.emit_shutdown(bot=bot)
 
 
 if __name__ == "__main__":
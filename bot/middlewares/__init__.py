@@ -1,7 +1,10 @@
 from .db import DbSessionMiddleware
 from .album import AlbumMiddleware
+from .fsm_buffer import BufferedFSMContext, FsmBufferMiddleware
 
 __all__ = [
     "DbSessionMiddleware",
     "AlbumMiddleware",
+    "BufferedFSMContext",
+    "FsmBufferMiddleware",
 ]
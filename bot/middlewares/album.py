@@ -1,15 +1,52 @@
+"""Middleware: collect the messages of a media group into one handler call.
+
+Telegram delivers an album as separate messages sharing ``media_group_id``.
+The first one to arrive owns the group: it waits on the group's future while
+later items join it, and then runs the handler once with ``album`` (sorted by
+message id). The group closes ``latency`` seconds after its latest item, after
+``max_wait`` seconds in total, or as soon as it holds ``max_size`` items.
+Closing is done by a timer on the event loop, not by the owner, so an entry
+never outlives its group even if the owner's handler fails or is cancelled.
+"""
+
+from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, Union, Callable, Awaitable
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
+logger = logging.getLogger(__name__)
+
+MAX_ALBUM_SIZE = 10     # Telegram album limit
+
+
+@dataclass
+class _Group:
+    started: float
+    done: asyncio.Future
+    messages: List[Message] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
 
 class AlbumMiddleware(BaseMiddleware):
-    def __init__(self, latency: float = 0.2):
+    def __init__(
+        self,
+        latency: float = 0.2,
+        max_wait: float = 2.0,
+        max_size: int = MAX_ALBUM_SIZE,
+        ttl: float = 60.0,
+    ):
         self.latency = latency
-        self.album_data = {}
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self.ttl = ttl
+        self._groups: Dict[str, _Group] = {}
+        self._last_sweep = time.monotonic()
 
     async def __call__(
         self,
@@ -20,14 +57,50 @@ class AlbumMiddleware(BaseMiddleware):
         if not event.media_group_id:
             return await handler(event, data)
 
-        try:
-            self.album_data[event.media_group_id].append(event)
+        self._sweep()
+        group = self._groups.get(event.media_group_id)
+        if group is not None:
+            # Joined an open group: its owner runs the handler
+            self._add(event.media_group_id, group, event)
+            return None
+
+        group = _Group(started=time.monotonic(), done=asyncio.get_running_loop().create_future())
+        self._groups[event.media_group_id] = group
+        self._add(event.media_group_id, group, event)
+
+        data["album"] = await group.done
+        return await handler(event, data)
+
+    # ------------------------------------------------------------------
+
+    def _add(self, group_id: str, group: _Group, message: Message) -> None:
+        group.messages.append(message)
+        if group.timer is not None:
+            group.timer.cancel()
+        if len(group.messages) >= self.max_size:
+            self._close(group_id)
             return
-        except KeyError:
-            self.album_data[event.media_group_id] = [event]
-            await asyncio.sleep(self.latency)
+        # Debounce: wait for the next item, but never past max_wait in total
+        remaining = group.started + self.max_wait - time.monotonic()
+        group.timer = asyncio.get_running_loop().call_later(
+            max(0.0, min(self.latency, remaining)), self._close, group_id,
+        )
 
-            data["album"] = self.album_data[event.media_group_id]
-            del self.album_data[event.media_group_id]
+    def _close(self, group_id: str) -> None:
+        group = self._groups.pop(group_id, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        if not group.done.done():
+            group.done.set_result(sorted(group.messages, key=lambda m: m.message_id))
 
-            return await handler(event, data)
+    def _sweep(self) -> None:
+        """Close groups that somehow outlived ``ttl`` (e.g. their loop timer was lost)."""
+        now = time.monotonic()
+        if now - self._last_sweep < self.ttl:
+            return
+        self._last_sweep = now
+        for group_id in [gid for gid, g in self._groups.items() if now - g.started > self.ttl]:
+            logger.warning(f"Closing stale media group {group_id}")
+            self._close(group_id)
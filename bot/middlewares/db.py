@@ -1,14 +1,49 @@
-"""Middleware: inject DB session into handler data."""
+"""Middleware: inject a lazily opened DB session into handler data."""
 
 from __future__ import annotations
 
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from bot import metrics
 from db.base import async_session
 
+handler_sessions = metrics.Counter(
+    "db_handler_sessions_total",
+    "Updates handled, by whether the handler used its DB session",
+    labels=("used",),
+)
+
+
+class LazySession:
+    """Stands in for an ``AsyncSession`` that is created on first use.
+
+    Handlers get it as ``session`` and use it like the real thing; updates
+    that never touch it (most questionnaire clicks) cost no session at all.
+    """
+
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory: async_sessionmaker[AsyncSession]) -> None:
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
 
 class DbSessionMiddleware(BaseMiddleware):
     async def __call__(
@@ -17,6 +52,10 @@ class DbSessionMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        async with async_session() as session:
-            data["session"] = session
+        session = LazySession(async_session)
+        data["session"] = session
+        try:
             return await handler(event, data)
+        finally:
+            handler_sessions.inc(used="yes" if session.started else "no")
+            await session.close()
@@ -0,0 +1,135 @@
+"""Middleware: buffer FSM state/data for the duration of one update.
+
+The handler receives a ``BufferedFSMContext`` as ``state``. Data is loaded
+once, ``get_data()`` hands out the live dict (mutate it in place, then call
+``update_data``/``mark_dirty``), and every change is flushed to the storage
+in a single write when the handler returns. A handler that raises writes
+nothing: changes it buffered before the exception are dropped, whereas
+without the buffer each ``set_state``/``update_data`` call was stored at once.
+
+The flush only merges the keys passed to ``update_data`` (or
+``mark_dirty(*keys)``) into the stored data, so two updates of the same user
+handled at once don't drop each other's keys. ``set_data``, ``clear`` and a
+bare ``mark_dirty()`` replace the whole dict, as they do without the buffer.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Awaitable, Callable, Dict, Mapping
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType
+from aiogram.types import TelegramObject
+
+
+class BufferedFSMContext(FSMContext):
+    _UNSET: Any = object()
+
+    def __init__(self, context: FSMContext) -> None:
+        super().__init__(storage=context.storage, key=context.key)
+        self._data: dict[str, Any] | None = None
+        self._state: Any = self._UNSET
+        self._state_dirty = False
+        # Whole dict to write, or just these keys to merge into the stored one
+        self._replace_data = False
+        self._dirty_keys: set[str] = set()
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_dirty = True
+
+    async def get_state(self) -> str | None:
+        if self._state is self._UNSET:
+            self._state = await self.storage.get_state(key=self.key)
+        return self._state
+
+    async def set_data(self, data: Mapping[str, Any]) -> None:
+        self._data = dict(data)
+        self._replace_data = True
+
+    async def get_data(self) -> dict[str, Any]:
+        """Return the live, update-scoped data dict (no copy)."""
+        if self._data is None:
+            # Our own copy, nested values included: in-place edits must not
+            # reach the storage (MemoryStorage copies only the top level) before flush()
+            self._data = copy.deepcopy(await self.storage.get_data(key=self.key))
+        return self._data
+
+    async def get_value(self, key: str, default: Any | None = None) -> Any | None:
+        return (await self.get_data()).get(key, default)
+
+    async def update_data(
+        self,
+        data: Mapping[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        current = await self.get_data()
+        current.update(kwargs)
+        self._dirty_keys.update(kwargs)
+        return current
+
+    async def clear(self) -> None:
+        self._state = None
+        self._data = {}
+        self._state_dirty = True
+        self._replace_data = True
+
+    def mark_dirty(self, *keys: str) -> None:
+        """Flag in-place mutations of ``get_data()`` (of ``keys``, or of anything) for the final flush."""
+        if keys:
+            self._dirty_keys.update(keys)
+        else:
+            self._replace_data = True
+
+    async def flush(self) -> None:
+        """Write buffered changes to the storage (one transaction on DbStorage)."""
+        data = merge = None
+        if self._replace_data:
+            data = self._data
+        elif self._dirty_keys:
+            merge = {k: self._data[k] for k in self._dirty_keys}
+        if not self._state_dirty and data is None and merge is None:
+            return
+
+        set_record = getattr(self.storage, "set_record", None)
+        if set_record is not None:
+            if self._state_dirty:
+                await set_record(self.key, state=self._state, data=data, merge=merge)
+            else:
+                await set_record(self.key, data=data, merge=merge)
+        else:
+            if self._state_dirty:
+                await self.storage.set_state(key=self.key, state=self._state)
+            if data is not None:
+                await self.storage.set_data(key=self.key, data=data)
+            if merge is not None:
+                await self.storage.update_data(key=self.key, data=merge)
+        self._state_dirty = False
+        self._replace_data = False
+        self._dirty_keys.clear()
+
+
+class FsmBufferMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        context = data.get("state")
+        if context is None or isinstance(context, BufferedFSMContext):
+            return await handler(event, data)
+
+        buffered = BufferedFSMContext(context)
+        if "raw_state" in data:
+            # Already read by aiogram's FSM middleware for the state filters
+            buffered._state = data["raw_state"]
+        data["state"] = buffered
+        result = await handler(event, data)
+        await buffered.flush()
+        return result
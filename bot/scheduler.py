@@ -0,0 +1,263 @@
+"""In-process scheduler for periodic background jobs.
+
+Jobs are plain coroutine functions registered with a trigger:
+
+* ``IntervalTrigger(seconds)`` — every N seconds;
+* ``CronTrigger.parse("0 3 * * *")`` — standard five-field cron
+  (minute hour day month weekday; ``*``, lists, ranges and ``*/step``),
+  evaluated in ``TIMEZONE``. Unlike classic cron, a run needs both the
+  day-of-month and the weekday field to match.
+
+Each run can be delayed by a random ``jitter`` so replicas and jobs don't
+fire in lockstep, and a job never has more than ``max_instances`` runs in
+flight (a run that would exceed it is skipped).
+
+With several bot replicas on PostgreSQL only one of them — the leader —
+runs jobs. Leadership is a session-level advisory lock held on a dedicated
+connection: if the leader dies its connection closes, the lock is released
+and another replica takes over on its next attempt. On SQLite the process
+is always the leader.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Awaitable, Callable, List, Optional, Set
+from zoneinfo import ZoneInfo
+
+from bot import metrics
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_KEY = zlib.crc32(b"telegram-tarif-bot:scheduler")
+# How often a follower retries the lock and the leader checks its connection
+LEADER_CHECK_INTERVAL = 15.0
+# A leader whose connection doesn't answer within this long steps down
+LEADER_PROBE_TIMEOUT = 5.0
+
+job_seconds = metrics.Histogram(
+    "scheduler_job_seconds", "Scheduled job run time", labels=("job", "outcome"),
+)
+job_skipped = metrics.Counter(
+    "scheduler_job_skipped_total", "Scheduled runs that did not start", labels=("job", "reason"),
+)
+is_leader = metrics.Gauge("scheduler_is_leader", "1 if this process runs the scheduled jobs")
+
+
+class IntervalTrigger:
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+
+    def next_after(self, now: datetime) -> datetime:
+        return now + timedelta(seconds=self.seconds)
+
+    def __repr__(self) -> str:
+        return f"every {self.seconds:g}s"
+
+
+class CronTrigger:
+    # (name, lowest, highest) of the five cron fields
+    FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 6))
+
+    def __init__(self, minute: Set[int], hour: Set[int], day: Set[int], month: Set[int], weekday: Set[int],
+                 tz: Optional[tzinfo] = None, expression: str = "") -> None:
+        self.minute, self.hour, self.day, self.month, self.weekday = minute, hour, day, month, weekday
+        self.tz = tz or timezone.utc
+        self.expression = expression
+
+    @classmethod
+    def parse(cls, expression: str, tz: Optional[tzinfo] = None) -> "CronTrigger":
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        values = [
+            cls._parse_field(part, low, high, name)
+            for part, (name, low, high) in zip(parts, cls.FIELDS)
+        ]
+        # Cron counts Sunday as 0 (and 7); Python's weekday() has Monday = 0
+        values[4] = {(d - 1) % 7 for d in values[4]}
+        return cls(*values, tz=tz, expression=expression)
+
+    @staticmethod
+    def _parse_field(text: str, low: int, high: int, name: str) -> Set[int]:
+        result: Set[int] = set()
+        # Sunday may also be written as 7
+        limit = 7 if name == "weekday" else high
+        for item in text.split(","):
+            value, _, step_text = item.partition("/")
+            step = int(step_text) if step_text else 1
+            if value == "*":
+                start, end = low, high
+            elif "-" in value:
+                start, end = (int(v) for v in value.split("-", 1))
+            else:
+                start = int(value)
+                end = high if step_text else start
+            if not low <= start <= end <= limit or step < 1:
+                raise ValueError(f"Bad cron {name} field: {text!r}")
+            result.update(range(start, end + 1, step))
+        return result
+
+    def next_after(self, now: datetime) -> datetime:
+        local = now.astimezone(self.tz).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Jump over whole days/hours that can't match; Feb 29 can be up to 8 years away
+        limit = local + timedelta(days=8 * 366)
+        while local < limit:
+            if local.month not in self.month or local.day not in self.day or local.weekday() not in self.weekday:
+                local = (local + timedelta(days=1)).replace(hour=0, minute=0)
+            elif local.hour not in self.hour:
+                local = (local + timedelta(hours=1)).replace(minute=0)
+            elif local.minute not in self.minute:
+                local += timedelta(minutes=1)
+            else:
+                return local.astimezone(timezone.utc)
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+    def __repr__(self) -> str:
+        return f"cron {self.expression!r}"
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[object]]
+    trigger: IntervalTrigger | CronTrigger
+    jitter: float = 0.0
+    max_instances: int = 1
+    running: Set[asyncio.Task] = field(default_factory=set)
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self.jobs: List[Job] = []
+        self._tasks: List[asyncio.Task] = []
+        self._leader_conn = None
+        self._leader = False
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[object]],
+        trigger: IntervalTrigger | CronTrigger,
+        jitter: float = 0.0,
+        max_instances: int = 1,
+    ) -> None:
+        self.jobs.append(Job(name, func, trigger, jitter, max_instances))
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._lead(), name="scheduler-leader")]
+        self._tasks += [
+            asyncio.create_task(self._loop(job), name=f"job-{job.name}") for job in self.jobs
+        ]
+        for job in self.jobs:
+            logger.info(f"Scheduled job {job.name}: {job.trigger!r}")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop triggering, give running jobs ``timeout`` to finish, then give up leadership."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        running = {task for job in self.jobs for task in job.running}
+        if running:
+            _, pending = await asyncio.wait(running, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._resign()
+
+    # ------------------------------------------------------------------
+
+    async def _loop(self, job: Job) -> None:
+        while True:
+            now = datetime.now(timezone.utc)
+            due = job.trigger.next_after(now)
+            delay = (due - now).total_seconds() + random.uniform(0, job.jitter)
+            await asyncio.sleep(max(0.0, delay))
+
+            if not self._leader:
+                job_skipped.inc(job=job.name, reason="not_leader")
+                continue
+            if len(job.running) >= job.max_instances:
+                job_skipped.inc(job=job.name, reason="max_instances")
+                logger.warning(f"Job {job.name} skipped: {len(job.running)} run(s) still in progress")
+                continue
+            task = asyncio.create_task(self._run(job), name=f"run-{job.name}")
+            job.running.add(task)
+            task.add_done_callback(job.running.discard)
+
+    async def _run(self, job: Job) -> None:
+        with job_seconds.time(job=job.name, outcome="error") as labels:
+            try:
+                await job.func()
+                labels["outcome"] = "ok"
+            except Exception as e:
+                logger.error(f"Job {job.name} failed: {e}", exc_info=True)
+
+    async def _lead(self) -> None:
+        if not settings.DATABASE_URL.startswith("postgresql"):
+            self._set_leader(True)
+            return
+        while True:
+            try:
+                if self._leader_conn is None:
+                    await self._try_acquire()
+                else:
+                    # Still connected means still holding the lock. Until the probe
+                    # answers that is unknown, so no new job runs meanwhile
+                    self._set_leader(False)
+                    await self._leader_conn.fetchval("SELECT 1", timeout=LEADER_PROBE_TIMEOUT)
+                    self._set_leader(True)
+            except Exception as e:
+                logger.warning(f"Scheduler lost its leader connection: {e}")
+                await self._resign()
+            await asyncio.sleep(LEADER_CHECK_INTERVAL)
+
+    async def _try_acquire(self) -> None:
+        import asyncpg
+
+        conn = await asyncpg.connect(settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+        try:
+            acquired = await conn.fetchval("SELECT pg_try_advisory_lock($1)", LEADER_LOCK_KEY)
+        except BaseException:
+            # Not ours yet: _resign() would not close it, and this runs every LEADER_CHECK_INTERVAL
+            conn.terminate()
+            raise
+        if acquired:
+            self._leader_conn = conn
+            self._set_leader(True)
+            logger.info("Scheduler: this process is the leader")
+        else:
+            await conn.close()
+
+    async def _resign(self) -> None:
+        self._set_leader(False)
+        conn, self._leader_conn = self._leader_conn, None
+        if conn is not None:
+            try:
+                # Closing the session releases the advisory lock
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+
+    def _set_leader(self, leader: bool) -> None:
+        self._leader = leader
+        is_leader.set(1 if leader else 0)
+
+
+def local_timezone() -> tzinfo:
+    try:
+        return ZoneInfo(settings.TIMEZONE)
+    except Exception:
+        logger.warning(f"Unknown TIMEZONE {settings.TIMEZONE!r}, cron jobs use UTC")
+        return timezone.utc
+
+
+scheduler = Scheduler()
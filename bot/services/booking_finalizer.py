@@ -0,0 +1,94 @@
+"""Booking finalization — slot, booking, answers and photos in one transaction.
+
+Question metadata is resolved through the registry's global question index,
+answers and photos are written with one bulk INSERT each, and the notifier
+gets the rows built here instead of re-selecting them.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.services.booking_service import BookingService
+from bot.services.conference_links import conference_links
+from bot.services.questionnaire_registry import registry
+from db.models import Booking, Photo, QuestionnaireAnswer, TariffType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FinalizedBooking:
+    booking: Booking
+    answers: List[QuestionnaireAnswer] = field(default_factory=list)
+    photos: List[Photo] = field(default_factory=list)
+
+
+class BookingFinalizer:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def finalize(
+        self,
+        user_id: int,
+        payment_id: int,
+        slot_id: int,
+        tariff: TariffType,
+        answers: dict,
+        saved_photos: list,
+    ) -> Optional[FinalizedBooking]:
+        """Create the booking with its answers and photos; ``None`` if the slot is taken.
+
+        ``answers`` is ``{question_id: answer}`` and ``saved_photos`` the
+        ``saved_photos`` list from FSM data. The returned answers and photos
+        are transient objects carrying the inserted values.
+        """
+        booking = await BookingService(self.session).add_booking(user_id, payment_id, slot_id, tariff)
+        if not booking:
+            return None
+
+        answer_rows = self._answer_rows(booking.id, answers)
+        photo_rows = [
+            {
+                "booking_id": booking.id,
+                "file_path": p["file_path"],
+                "telegram_file_id": p.get("telegram_file_id"),
+                "content_hash": p.get("content_hash"),
+            }
+            for p in saved_photos
+        ]
+        if answer_rows:
+            await self.session.execute(insert(QuestionnaireAnswer), answer_rows)
+        if photo_rows:
+            await self.session.execute(insert(Photo), photo_rows)
+        await self.session.commit()
+        conference_links.enqueue(booking.id)
+
+        logger.info(
+            f"Booking {booking.id} finalized: {len(answer_rows)} answer(s), {len(photo_rows)} photo(s)"
+        )
+        return FinalizedBooking(
+            booking=booking,
+            answers=[QuestionnaireAnswer(**row) for row in answer_rows],
+            photos=[Photo(**row) for row in photo_rows],
+        )
+
+    @staticmethod
+    def _answer_rows(booking_id: int, answers: dict) -> List[dict]:
+        index = registry.question_index()
+        rows = []
+        for q_id, answer_text in answers.items():
+            q_type, question = index.get(q_id, ("basic", None))
+            rows.append({
+                "booking_id": booking_id,
+                "questionnaire_type": q_type,
+                "question_id": q_id,
+                "question_text": question.text if question else q_id,
+                "answer": answer_text,
+            })
+        return rows
@@ -3,16 +3,32 @@
 from __future__ import annotations
 
 import logging
-from typing import Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from db.models import Booking, BookingStatus, TariffType, Slot
-from bot.services.google_meet import GoogleMeetService
+from db.models import Booking, BookingStatus, TariffType
+from bot.services.conference_links import conference_links
+from bot.services.slot_service import SlotService
 
 logger = logging.getLogger(__name__)
 
+HISTORY_PAGE_SIZE = 20
+
+# Keyset cursor: (created_at, id) of a booking at the edge of a page
+HistoryCursor = Tuple[datetime, int]
+
+
+@dataclass
+class HistoryPage:
+    bookings: List[Booking] = field(default_factory=list)
+    prev_cursor: Optional[HistoryCursor] = None   # newest row, if there are newer rows
+    next_cursor: Optional[HistoryCursor] = None   # oldest row, if there are older rows
+
 
 class BookingService:
     def __init__(self, session: AsyncSession) -> None:
@@ -24,47 +40,98 @@ class BookingService:
         payment_id: int,
         slot_id: int,
         tariff: TariffType,
-    ) -> Booking:
-        # 1. Get slot info for meeting details
-        slot = await self.session.get(Slot, slot_id)
+    ) -> Optional[Booking]:
+        """Book the slot and create the booking in one transaction.
+
+        Returns ``None`` if the slot is already booked or deleted.
+        """
+        booking = await self.add_booking(user_id, payment_id, slot_id, tariff)
+        if not booking:
+            return None
+        await self.session.commit()
+        conference_links.enqueue(booking.id)
+        return booking
+
+    async def add_booking(
+        self,
+        user_id: int,
+        payment_id: int,
+        slot_id: int,
+        tariff: TariffType,
+    ) -> Optional[Booking]:
+        """Book the slot and flush a new ``Booking`` without committing.
+
+        The caller commits (and enqueues the conference link) once everything
+        that belongs to the booking is written. Rolls back and returns ``None``
+        if the slot is already taken.
+        """
+        slot = await SlotService(self.session).book_slot(slot_id)
         if not slot:
-            raise ValueError(f"Slot {slot_id} not found")
-
-        # 2. Try to generate Google Meet link
-        conference_link = None
-        try:
-            meet_service = GoogleMeetService()
-            # Summary: "Consultation - [Tariff]" or similar
-            summary = f"Консультация ({tariff.value})"
-            description = f"Онлайн-консультация. Тариф: {tariff.value}"
-            
-            link_obj = meet_service.create_meeting(
-                summary=summary,
-                description=description,
-                start_time=slot.datetime_utc,
-                duration_minutes=slot.duration_minutes
-            )
-            if link_obj:
-                conference_link = link_obj.url
-        except Exception as e:
-            logger.error(f"Failed to generate Google Meet link: {e}")
-
-        # Fallback if generation failed
-        if not conference_link:
-            conference_link = "Ссылка будет отправлена администратором вручную"
+            await self.session.rollback()
+            return None
 
+        # Google Meet link is created in the background (see conference_links)
         booking = Booking(
             user_id=user_id,
             payment_id=payment_id,
             slot_id=slot_id,
             tariff=tariff,
             status=BookingStatus.active,
-            conference_link=conference_link,
+            slot=slot,
         )
         self.session.add(booking)
-        await self.session.commit()
-        await self.session.refresh(booking)
+        await self.session.flush()
         return booking
 
     async def get_booking(self, booking_id: int) -> Optional[Booking]:
         return await self.session.get(Booking, booking_id)
+
+    async def get_history_page(
+        self,
+        tariff: Optional[TariffType] = None,
+        status: Optional[BookingStatus] = None,
+        since: Optional[datetime] = None,
+        cursor: Optional[HistoryCursor] = None,
+        backwards: bool = False,
+        limit: int = HISTORY_PAGE_SIZE,
+    ) -> HistoryPage:
+        """One page of bookings, newest first, keyset-paginated on ``(created_at, id)``.
+
+        Without ``cursor`` returns the newest page. With ``cursor`` returns the
+        page right after it (older), or right before it (newer) if ``backwards``.
+        User, slot and payment are joined into the same query.
+        """
+        order_key = tuple_(Booking.created_at, Booking.id)
+        stmt = select(Booking).options(
+            joinedload(Booking.user), joinedload(Booking.slot), joinedload(Booking.payment),
+        )
+        if tariff:
+            stmt = stmt.where(Booking.tariff == tariff)
+        if status:
+            stmt = stmt.where(Booking.status == status)
+        if since:
+            stmt = stmt.where(Booking.created_at >= since)
+        if cursor:
+            stmt = stmt.where(order_key > tuple_(*cursor) if backwards else order_key < tuple_(*cursor))
+        if backwards:
+            stmt = stmt.order_by(Booking.created_at.asc(), Booking.id.asc())
+        else:
+            stmt = stmt.order_by(Booking.created_at.desc(), Booking.id.desc())
+
+        result = await self.session.execute(stmt.limit(limit + 1))
+        rows = list(result.scalars().all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return HistoryPage()
+
+        newer = has_more if backwards else cursor is not None
+        older = cursor is not None if backwards else has_more
+        first, last = rows[0], rows[-1]
+        return HistoryPage(
+            bookings=rows,
+            prev_cursor=(first.created_at, first.id) if newer else None,
+            next_cursor=(last.created_at, last.id) if older else None,
+        )
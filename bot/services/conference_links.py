@@ -0,0 +1,155 @@
+"""Background attachment of Google Meet links to bookings.
+
+Bookings are created without a conference link; their ids go into an
+asyncio queue and a single worker creates the Meet event off the request
+path, stores the link on the ``Booking`` and sends it to the user and admins.
+A failed Google call is retried a few times with a growing delay (the same
+``requestId`` makes retries idempotent) before the manual fallback is stored.
+
+Every replica requeues pending bookings on start, so a worker first claims
+the booking (``link_claimed_at``) with a conditional UPDATE and skips it if
+another process holds a fresh claim; the claim is released before a retry.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import selectinload
+
+from bot import texts
+from bot.services.delivery import delivery
+from bot.services.google_meet import get_meet_service, shutdown_meet_service
+from config.settings import settings
+from db.base import async_session
+from db.models import Booking, BookingStatus, Slot
+
+logger = logging.getLogger(__name__)
+
+MANUAL_LINK_FALLBACK = "Ссылка будет отправлена администратором вручную"
+# Attempts to create the Meet event; retry n waits n * MEET_RETRY_DELAY seconds
+MEET_ATTEMPTS = 3
+MEET_RETRY_DELAY = 30.0
+# A claim older than this is from a process that died mid-way and is taken over
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ConferenceLinkQueue:
+    def __init__(self) -> None:
+        # (booking id, attempt)
+        self._queue: asyncio.Queue[tuple[int, int]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def enqueue(self, booking_id: int, attempt: int = 1) -> None:
+        self._queue.put_nowait((booking_id, attempt))
+
+    async def start(self) -> None:
+        await self._requeue_missing()
+        self._task = asyncio.create_task(self._run(), name="conference-links")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        shutdown_meet_service()
+
+    async def _requeue_missing(self) -> None:
+        """Pick up upcoming bookings whose link was still pending at the last shutdown."""
+        now = _utcnow()
+        async with async_session() as session:
+            result = await session.execute(
+                select(Booking.id)
+                .join(Slot, Booking.slot_id == Slot.id)
+                .where(
+                    Booking.conference_link.is_(None),
+                    Booking.status == BookingStatus.active,
+                    Slot.datetime_utc > now,
+                )
+            )
+            for booking_id in result.scalars():
+                self.enqueue(booking_id)
+
+    async def _run(self) -> None:
+        while True:
+            booking_id, attempt = await self._queue.get()
+            try:
+                await self._attach(booking_id, attempt)
+            except Exception as e:
+                logger.error(f"Failed to attach conference link to booking {booking_id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _attach(self, booking_id: int, attempt: int = 1) -> None:
+        now = _utcnow()
+        async with async_session() as session:
+            # Claim first: after a restart every replica requeues the same bookings
+            claimed = await session.execute(
+                update(Booking)
+                .where(
+                    Booking.id == booking_id,
+                    Booking.conference_link.is_(None),
+                    or_(Booking.link_claimed_at.is_(None), Booking.link_claimed_at < now - CLAIM_LEASE),
+                )
+                .values(link_claimed_at=now)
+                .returning(Booking.id)
+            )
+            await session.commit()
+            if claimed.scalar_one_or_none() is None:
+                return
+            booking = await session.get(
+                Booking, booking_id, options=[selectinload(Booking.slot), selectinload(Booking.user)]
+            )
+            tariff = booking.tariff
+            slot_start, duration = booking.slot.datetime_utc, booking.slot.duration_minutes
+            telegram_id = booking.user.telegram_id
+
+        meet_service = get_meet_service()
+        link_obj = None
+        if meet_service.available:
+            link_obj = await meet_service.create_meeting_async(
+                summary=f"Консультация ({tariff.value})",
+                description=f"Онлайн-консультация. Тариф: {tariff.value}",
+                start_time=slot_start,
+                duration_minutes=duration,
+                request_id=f"booking-{booking_id}",
+            )
+        link = link_obj.url if link_obj and link_obj.url else None
+
+        async with async_session() as session:
+            if link is None and meet_service.available and attempt < MEET_ATTEMPTS:
+                # Release the claim; off the queue meanwhile, other bookings aren't held up
+                await session.execute(
+                    update(Booking).where(Booking.id == booking_id).values(link_claimed_at=None)
+                )
+                await session.commit()
+                logger.warning(f"Meet link for booking {booking_id} failed (attempt {attempt}), retrying")
+                asyncio.get_running_loop().call_later(
+                    MEET_RETRY_DELAY * attempt, self.enqueue, booking_id, attempt + 1,
+                )
+                return
+            await session.execute(
+                update(Booking)
+                .where(Booking.id == booking_id, Booking.conference_link.is_(None))
+                .values(conference_link=link or MANUAL_LINK_FALLBACK, link_claimed_at=None)
+            )
+            await session.commit()
+        if link is None:
+            return
+
+        text = texts.CONFERENCE_LINK_READY.format(date=slot_start.strftime("%d.%m.%Y %H:%M"), link=link)
+        for chat_id in [telegram_id, *settings.ADMIN_IDS]:
+            delivery.send_text(chat_id, text)
+
+
+conference_links = ConferenceLinkQueue()
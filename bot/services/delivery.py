@@ -0,0 +1,177 @@
+"""Outbound Telegram delivery — rate-limited, concurrent across chats, off the request path.
+
+Each ``send()`` call is one ordered batch for one chat (e.g. notification
+text chunks followed by photo albums). Every worker of a small pool has its
+own queue and a chat always goes to the same one (``chat_id % workers``), so
+different chats are delivered concurrently while batches for one chat keep
+the order they were sent in. Every request takes a token from the global
+bucket (Telegram allows ~30 messages/s per bot) and from the chat's bucket
+(~1 message/s per chat); ``RetryAfter`` answers are honoured and retried.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.types import InputMediaPhoto
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30.0        # requests per second for the whole bot
+PER_CHAT_RATE = 1.0       # requests per second for one chat
+PER_CHAT_BURST = 3
+MEDIA_GROUP_SIZE = 10     # Telegram album limit
+MAX_ATTEMPTS = 5
+# How often idle per-chat buckets are dropped (seconds)
+BUCKET_SWEEP_INTERVAL = 60.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def idle(self, now: float) -> bool:
+        """Full again and unused: a fresh bucket would behave the same."""
+        return not self._lock.locked() and self._tokens + (now - self._updated) * self.rate >= self.capacity
+
+
+@dataclass
+class TextMessage:
+    text: str
+    parse_mode: Optional[str] = "HTML"
+
+
+@dataclass
+class PhotoAlbum:
+    file_ids: List[str] = field(default_factory=list)
+
+
+Action = Union[TextMessage, PhotoAlbum]
+
+
+def photo_albums(file_ids: List[str]) -> List[PhotoAlbum]:
+    """Split photos into Telegram-sized albums (``send_media_group`` takes up to 10)."""
+    return [
+        PhotoAlbum(file_ids[i: i + MEDIA_GROUP_SIZE])
+        for i in range(0, len(file_ids), MEDIA_GROUP_SIZE)
+    ]
+
+
+class DeliveryService:
+    def __init__(self, workers: int = 4) -> None:
+        self.workers = workers
+        # One queue per worker; a chat is always served by the same worker
+        self._queues: list[asyncio.Queue[tuple[int, List[Action]]]] = [
+            asyncio.Queue() for _ in range(workers)
+        ]
+        self._global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._last_sweep = time.monotonic()
+        self._tasks: list[asyncio.Task] = []
+        self._bot: Bot | None = None
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._tasks = [
+            asyncio.create_task(self._worker(queue), name=f"delivery-{i}")
+            for i, queue in enumerate(self._queues)
+        ]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Drain what is already queued (up to ``timeout``), then stop the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            undelivered = sum(queue.qsize() for queue in self._queues)
+            logger.warning(f"Delivery stopped with {undelivered} batch(es) undelivered")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def send(self, chat_id: int, actions: List[Action]) -> None:
+        """Queue an ordered batch of messages for ``chat_id``; returns immediately."""
+        if actions:
+            self._queues[chat_id % len(self._queues)].put_nowait((chat_id, actions))
+
+    def send_text(self, chat_id: int, text: str, parse_mode: Optional[str] = "HTML") -> None:
+        self.send(chat_id, [TextMessage(text, parse_mode)])
+
+    # ------------------------------------------------------------------
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            chat_id, actions = await queue.get()
+            try:
+                for action in actions:
+                    await self._deliver(chat_id, action)
+            except Exception as e:
+                logger.error(f"Failed to deliver to {chat_id}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, chat_id: int, action: Action) -> None:
+        self._sweep_buckets()
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(PER_CHAT_RATE, PER_CHAT_BURST)
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await bucket.acquire()
+            await self._global_bucket.acquire()
+            try:
+                await self._call(chat_id, action)
+                return
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood limit for {chat_id}, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                logger.warning(f"Transient error sending to {chat_id} ({e}), attempt {attempt}")
+                await asyncio.sleep(2 ** attempt)
+        raise RuntimeError(f"gave up after {MAX_ATTEMPTS} attempts")
+
+    def _sweep_buckets(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < BUCKET_SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        for chat_id in [c for c, bucket in self._chat_buckets.items() if bucket.idle(now)]:
+            del self._chat_buckets[chat_id]
+
+    async def _call(self, chat_id: int, action: Action) -> None:
+        if isinstance(action, TextMessage):
+            await self._bot.send_message(chat_id, action.text, parse_mode=action.parse_mode)
+        elif len(action.file_ids) == 1:
+            await self._bot.send_photo(chat_id, action.file_ids[0])
+        else:
+            await self._bot.send_media_group(
+                chat_id, [InputMediaPhoto(media=file_id) for file_id in action.file_ids]
+            )
+
+
+delivery = DeliveryService()
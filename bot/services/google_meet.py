@@ -1,6 +1,9 @@
+import asyncio
 import datetime
 import pickle
 import os.path
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
 from pathlib import Path
@@ -15,41 +18,89 @@ SCOPES = ['https://www.googleapis.com/auth/calendar']
 BASE_DIR = Path(__file__).parent.parent.parent
 TOKEN_FILE = BASE_DIR / 'config' / 'google_token.pickle'
 
+# googleapiclient/httplib2 objects are not thread-safe: each pool thread
+# gets its own Calendar client, all sharing one set of credentials
+MAX_WORKERS = 2
+
 @dataclass
 class MeetingLink:
     url: str
     event_id: str
 
 class GoogleMeetService:
+    """Process-wide Google Calendar client. Use ``get_meet_service()``.
+
+    Credentials are unpickled once; the Calendar client is built from the
+    discovery document bundled with google-api-python-client (no network
+    fetch), and all API calls run in a dedicated thread pool so they never
+    block the event loop.
+    """
+
     def __init__(self):
         self.creds = None
-        self.service = None
+        self._creds_lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="google-meet")
         self._authenticate()
 
+    @property
+    def available(self) -> bool:
+        return self.creds is not None
+
     def _authenticate(self):
         if os.path.exists(TOKEN_FILE):
             with open(TOKEN_FILE, 'rb') as token:
                 self.creds = pickle.load(token)
-        
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
+
+        if not self.creds:
+            # If no valid token found, we can't do much automatically in a server context without interactive login
+            # But here we assume set_google.py was run locally.
+            # In docker, we mount the token file.
+            logger.error("No valid Google token found. Run setup_google.py locally.")
+
+    def _ensure_valid_creds(self) -> bool:
+        """Refresh the shared credentials if needed (called from pool threads)."""
+        with self._creds_lock:
+            if not self.creds:
+                return False
+            if self.creds.valid:
+                return True
+            if self.creds.expired and self.creds.refresh_token:
                 self.creds.refresh(Request())
                 # Save refreshed token
                 with open(TOKEN_FILE, 'wb') as token:
                     pickle.dump(self.creds, token)
-            else:
-                # If no valid token found, we can't do much automatically in a server context without interactive login
-                # But here we assume set_google.py was run locally.
-                # In docker, we mount the token file.
-                logger.error("No valid Google token found. Run setup_google.py locally.")
-                return
-
-        self.service = build('calendar', 'v3', credentials=self.creds)
-
-    def create_meeting(self, summary: str, description: str, start_time: datetime.datetime, duration_minutes: int = 60) -> MeetingLink | None:
-        """Create a Google Meet event and return the link."""
-        if not self.service:
-            logger.error("Google Calendar service not initialized.")
+                return True
+            logger.error("Google token is invalid and cannot be refreshed. Run setup_google.py locally.")
+            return False
+
+    def _calendar(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = build(
+                'calendar', 'v3',
+                credentials=self.creds,
+                cache_discovery=False,
+                static_discovery=True,
+            )
+            self._local.service = service
+        return service
+
+    def create_meeting(
+        self,
+        summary: str,
+        description: str,
+        start_time: datetime.datetime,
+        duration_minutes: int = 60,
+        request_id: str | None = None,
+    ) -> MeetingLink | None:
+        """Create a Google Meet event and return the link. Blocking — prefer ``create_meeting_async``."""
+        try:
+            if not self._ensure_valid_creds():
+                logger.error("Google Calendar service not initialized.")
+                return None
+        except Exception as e:
+            logger.error(f"Failed to refresh Google token: {e}")
             return None
 
         end_time = start_time + datetime.timedelta(minutes=duration_minutes)
@@ -67,19 +118,20 @@ class GoogleMeetService:
             },
             'conferenceData': {
                 'createRequest': {
-                    'requestId': f"meet-{int(start_time.timestamp())}",
+                    # Same request id on retry -> Google returns the same conference
+                    'requestId': request_id or f"meet-{int(start_time.timestamp())}",
                     'conferenceSolutionKey': {'type': 'hangoutsMeet'}
                 }
             },
         }
 
         try:
-            event = self.service.events().insert(
-                calendarId='primary', 
-                body=event, 
+            event = self._calendar().events().insert(
+                calendarId='primary',
+                body=event,
                 conferenceDataVersion=1
             ).execute()
-            
+
             meet_link = event.get('hangoutLink')
             event_id = event.get('id')
             logger.info(f"Meeting created: {meet_link}")
@@ -89,6 +141,36 @@ class GoogleMeetService:
             logger.error(f"Error creating meeting: {e}")
             return None
 
-# Singleton instance
-# google_meet_service = GoogleMeetService() 
-# Not creating globally to avoid init on import if token missing
+    async def create_meeting_async(
+        self,
+        summary: str,
+        description: str,
+        start_time: datetime.datetime,
+        duration_minutes: int = 60,
+        request_id: str | None = None,
+    ) -> MeetingLink | None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: self.create_meeting(summary, description, start_time, duration_minutes, request_id),
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton instance — created on first use to avoid init on import if token missing
+_meet_service: GoogleMeetService | None = None
+
+
+def get_meet_service() -> GoogleMeetService:
+    global _meet_service
+    if _meet_service is None:
+        _meet_service = GoogleMeetService()
+    return _meet_service
+
+
+def shutdown_meet_service() -> None:
+    """Stop the worker threads — only if the service was ever created."""
+    if _meet_service is not None:
+        _meet_service.shutdown()
@@ -3,11 +3,11 @@
 from __future__ import annotations
 
 import html
-import logging
 from typing import TYPE_CHECKING
 
 from aiogram import Bot
 
+from bot.services.delivery import TextMessage, delivery, photo_albums
 from config.settings import settings
 
 if TYPE_CHECKING:
@@ -62,19 +62,14 @@ class NotificationService:
 
         message = "\n".join(text_parts)
 
-        # Send to each admin; truncate if too long
+        # Telegram max message 4096 chars
+        actions: list = [
+            TextMessage(message[chunk_start: chunk_start + 4000])
+            for chunk_start in range(0, len(message), 4000)
+        ]
+        actions += photo_albums([p.telegram_file_id for p in photos if p.telegram_file_id])
+
+        # Queued: admins are served concurrently by the delivery workers,
+        # the user's confirmation doesn't wait for any of it
         for admin_id in settings.ADMIN_IDS:
-            try:
-                # Telegram max message 4096 chars
-                for chunk_start in range(0, len(message), 4000):
-                    await self.bot.send_message(
-                        admin_id,
-                        message[chunk_start: chunk_start + 4000],
-                        parse_mode="HTML",
-                    )
-                # Forward photos
-                for photo in photos:
-                    if photo.telegram_file_id:
-                        await self.bot.send_photo(admin_id, photo.telegram_file_id)
-            except Exception as e:
-                logging.error(f"Failed to notify admin {admin_id}: {e}")
+            delivery.send(admin_id, actions)
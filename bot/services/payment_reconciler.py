@@ -0,0 +1,193 @@
+"""Background reconciliation of pending payments with YooKassa.
+
+Webhooks normally confirm a payment within seconds; when one is lost or
+late, the reconciler notices. Every ``PAYMENT_RECONCILE_INTERVAL`` seconds
+(as jobs on ``bot.scheduler``) it takes a batch of payments that have been pending for longer than
+``PAYMENT_RECONCILE_MIN_AGE``, asks YooKassa about them a few at a time and
+applies the result through the webhook handlers, so the user is moved on
+exactly as if the notification had arrived. Payments still pending after
+``PAYMENT_EXPIRE_AFTER`` are treated as abandoned and cancelled; if YooKassa
+can't tell us anything about one (a 404 after a credentials change, the API
+disabled), it is cancelled locally ``UNCONFIRMED_EXPIRE_MARGIN`` later, so
+such rows never clog the batch.
+
+Expiry only cancels our ``Payment`` row: YooKassa can't cancel a pending
+payment, and the user may still pay at the confirmation URL until YooKassa
+expires it. Such a late payment still arrives as ``payment.succeeded`` and
+moves the payment back to succeeded, so the user is not lost.
+
+Every status seen (from the API or a webhook) goes into a short-lived
+in-memory cache, so repeated "check payment" presses don't each cost an
+API round trip.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+
+from bot.services.yookassa_service import get_yookassa
+from config.settings import settings
+from db.base import async_session
+from db.models import Payment, PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+# Statuses YooKassa never leaves
+FINAL_STATUSES = {"succeeded", "canceled"}
+# Past expiry, payments YooKassa gives no answer for are cancelled without it
+UNCONFIRMED_EXPIRE_MARGIN = timedelta(hours=1)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class PaymentStatusCache:
+    """YooKassa payment info by payment id; final statuses are kept longer than pending ones."""
+
+    def __init__(self, ttl: float = 10.0, final_ttl: float = 600.0, max_entries: int = 10000) -> None:
+        self.ttl = ttl
+        self.final_ttl = final_ttl
+        self.max_entries = max_entries
+        # payment id -> (expires_at, info)
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    def get(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(payment_id)
+        if entry is None:
+            return None
+        expires_at, info = entry
+        if time.monotonic() >= expires_at:
+            self._entries.pop(payment_id, None)
+            return None
+        return info
+
+    def put(self, info: Dict[str, Any]) -> None:
+        if not info.get("id"):
+            return
+        if len(self._entries) >= self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+        ttl = self.final_ttl if info.get("status") in FINAL_STATUSES else self.ttl
+        self._entries[info["id"]] = (time.monotonic() + ttl, info)
+
+    async def fetch(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        """Cached info, or one API call shared by everyone asking at the same time."""
+        info = self.get(payment_id)
+        if info is not None:
+            return info
+        future = self._loading.get(payment_id)
+        if future is None:
+            future = asyncio.ensure_future(get_yookassa().get_payment_info(payment_id))
+            self._loading[payment_id] = future
+            future.add_done_callback(lambda _: self._loading.pop(payment_id, None))
+        info = await asyncio.shield(future)
+        if info is not None:
+            self.put(info)
+        return info
+
+
+class PaymentReconciler:
+    def __init__(self) -> None:
+        self.statuses = PaymentStatusCache(ttl=settings.PAYMENT_STATUS_CACHE_TTL)
+
+    async def reconcile(self) -> int:
+        """Check a batch of pending payments with YooKassa; the number resolved."""
+        now = _utcnow()
+        payments = await self._pending(
+            Payment.created_at < now - timedelta(seconds=settings.PAYMENT_RECONCILE_MIN_AGE),
+            Payment.created_at >= now - timedelta(seconds=settings.PAYMENT_EXPIRE_AFTER),
+        )
+        resolved = await self._check_all(payments, expire=False)
+        if resolved:
+            logger.info(f"Payment reconciliation: {resolved} payment(s) resolved")
+        return resolved
+
+    async def expire(self) -> int:
+        """Cancel payments abandoned for ``PAYMENT_EXPIRE_AFTER``; the number resolved.
+
+        Each one is checked with YooKassa first, so a payment made at the last
+        moment is confirmed rather than expired.
+        """
+        cutoff = _utcnow() - timedelta(seconds=settings.PAYMENT_EXPIRE_AFTER)
+        async with async_session() as session:
+            # The YooKassa payment was never created: nothing to ask about. Or it
+            # is still here well past expiry because YooKassa gives no answer
+            # about it (404, API disabled), and checking it again would not help
+            result = await session.execute(
+                update(Payment)
+                .where(
+                    Payment.status == PaymentStatus.pending,
+                    or_(
+                        and_(Payment.yookassa_payment_id.is_(None), Payment.created_at < cutoff),
+                        Payment.created_at < cutoff - UNCONFIRMED_EXPIRE_MARGIN,
+                    ),
+                )
+                .values(status=PaymentStatus.cancelled)
+            )
+            await session.commit()
+        orphans = result.rowcount or 0
+
+        payments = await self._pending(Payment.created_at < cutoff)
+        resolved = orphans + await self._check_all(payments, expire=True)
+        if resolved:
+            logger.info(f"Payment expiry: {resolved} abandoned payment(s) resolved")
+        return resolved
+
+    # ------------------------------------------------------------------
+
+    async def _pending(self, *conditions) -> List[str]:
+        async with async_session() as session:
+            result = await session.execute(
+                select(Payment.yookassa_payment_id)
+                .where(
+                    Payment.status == PaymentStatus.pending,
+                    Payment.yookassa_payment_id.is_not(None),
+                    *conditions,
+                )
+                .order_by(Payment.created_at)
+                .limit(settings.PAYMENT_RECONCILE_BATCH)
+            )
+            return list(result.scalars())
+
+    async def _check_all(self, payment_ids: List[str], expire: bool) -> int:
+        semaphore = asyncio.Semaphore(settings.PAYMENT_RECONCILE_CONCURRENCY)
+
+        async def check(payment_id: str) -> bool:
+            async with semaphore:
+                try:
+                    return await self._check(payment_id, expire)
+                except Exception as e:
+                    logger.error(f"Reconciling payment {payment_id} failed: {e}", exc_info=True)
+                    return False
+
+        results = await asyncio.gather(*(check(payment_id) for payment_id in payment_ids))
+        return sum(results)
+
+    async def _check(self, payment_id: str, expire: bool) -> bool:
+        from bot.webhook_server import _handle_payment_cancelled, _handle_payment_succeeded
+
+        # Always ask the API: a cached "pending" is exactly what we are re-checking
+        info = await get_yookassa().get_payment_info(payment_id)
+        if info is None:
+            return False
+        self.statuses.put(info)
+
+        if info["status"] == "succeeded" and info["paid"]:
+            await _handle_payment_succeeded(payment_id, info)
+        elif info["status"] == "canceled":
+            await _handle_payment_cancelled(payment_id)
+        elif expire:
+            await _handle_payment_cancelled(payment_id, expired=True)
+        else:
+            return False
+        return True
+
+
+payment_reconciler = PaymentReconciler()
@@ -2,21 +2,63 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional
 
-import aiofiles
+from aiogram import Bot
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.services.photo_store import delete_files, photo_store
 from config.settings import settings
+from db.base import async_session
 from db.models import Photo
 
 
+PURGE_BATCH_SIZE = 500
+
+
+@dataclass
+class PurgeResult:
+    rows: int = 0       # photos marked purged
+    files: int = 0      # files deleted from disk
+
+
+@dataclass
+class PhotoDownload:
+    file_id: str
+    file_unique_id: str
+    # Filled in once the photo is in the store
+    content_hash: Optional[str] = None
+    path: Optional[Path] = None
+
+
+async def download_photos(bot: Bot, items: list[PhotoDownload], concurrency: int | None = None) -> list[PhotoDownload]:
+    """Download photos in parallel, streaming each one into the photo store.
+
+    Returns the items that were saved; failed downloads are logged and skipped.
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.PHOTO_DOWNLOAD_CONCURRENCY)
+
+    async def fetch(item: PhotoDownload) -> PhotoDownload | None:
+        async with semaphore:
+            try:
+                stored = await photo_store.download(bot, item.file_id)
+                item.content_hash, item.path = stored.content_hash, stored.path
+                return item
+            except Exception as e:
+                logging.error(f"Failed to download photo {item.file_unique_id}: {e}")
+                return None
+
+    results = await asyncio.gather(*(fetch(item) for item in items))
+    return [item for item in results if item]
+
+
 class PhotoService:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
@@ -27,20 +69,14 @@ class PhotoService:
         booking_id: int,
         user_id: int,
         file_data: bytes,
-        filename: str,
         telegram_file_id: Optional[str] = None,
     ) -> Photo:
-        folder = self.upload_dir / str(user_id) / str(booking_id)
-        folder.mkdir(parents=True, exist_ok=True)
-        file_path = folder / filename
-
-        async with aiofiles.open(file_path, "wb") as f:
-            await f.write(file_data)
-
+        stored = await photo_store.put(file_data)
         photo = Photo(
             booking_id=booking_id,
-            file_path=str(file_path),
+            file_path=str(stored.path),
             telegram_file_id=telegram_file_id,
+            content_hash=stored.content_hash,
         )
         self.session.add(photo)
         await self.session.commit()
@@ -56,22 +92,54 @@ class PhotoService:
         photos = await self.get_photos_for_booking(booking_id)
         return len(photos)
 
-    @staticmethod
-    def cleanup_old_photos(retention_days: int | None = None) -> int:
-        """Synchronous cleanup for cron usage."""
+    async def purge_expired(
+        self, retention_days: int | None = None, batch_size: int = PURGE_BATCH_SIZE,
+    ) -> PurgeResult:
+        """Remove the files of photos older than the retention period.
+
+        Expired rows are found through ``ix_photos_unpurged_uploaded_at`` a
+        batch at a time and marked ``purged_at``; a stored object is deleted
+        once no unpurged row shares it. Files go first and the batch commits
+        after, so an interrupted run just redoes its last batch. The cost
+        follows the number of expired photos, not the size of the archive.
+        """
         days = retention_days or settings.PHOTO_RETENTION_DAYS
-        upload_dir = Path(settings.UPLOAD_DIR)
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        removed = 0
-        if not upload_dir.exists():
-            return 0
-        for f in upload_dir.rglob("*"):
-            if f.is_file():
-                mtime = datetime.fromtimestamp(f.stat().st_mtime, tz=timezone.utc)
-                if mtime < cutoff:
-                    try:
-                        f.unlink()
-                        removed += 1
-                    except OSError as e:
-                        logging.warning(f"Cannot remove {f}: {e}")
-        return removed
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+        result = PurgeResult()
+        while True:
+            rows = (await self.session.execute(
+                select(Photo.id, Photo.content_hash, Photo.file_path)
+                .where(Photo.purged_at.is_(None), Photo.uploaded_at < cutoff)
+                .order_by(Photo.uploaded_at)
+                .limit(batch_size)
+                # Several cleanup runs can share the work on PostgreSQL
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                break
+
+            await self.session.execute(
+                update(Photo)
+                .where(Photo.id.in_([row.id for row in rows]))
+                .values(purged_at=datetime.now(timezone.utc).replace(tzinfo=None))
+            )
+            # Stored objects are shared; files from before the store belong to one row each
+            result.files += await photo_store.release(self.session, [row.content_hash for row in rows])
+            result.files += await delete_files([Path(row.file_path) for row in rows if not row.content_hash])
+            await self.session.commit()
+            result.rows += len(rows)
+            if len(rows) < batch_size:
+                break
+        return result
+
+
+async def cleanup_photos() -> tuple[PurgeResult, int]:
+    """Retention job: expired photos, then uploads of unfinished bookings."""
+    async with async_session() as session:
+        purged = await PhotoService(session).purge_expired()
+        swept = await photo_store.sweep_pending(session)
+    if purged.rows or purged.files or swept:
+        logging.info(
+            f"Photo cleanup: {purged.rows} photo(s) purged, {purged.files + swept} file(s) removed"
+        )
+    return purged, swept
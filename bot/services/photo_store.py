@@ -0,0 +1,218 @@
+"""Content-addressed photo store.
+
+Every image is stored once, under the SHA-256 of its bytes, in two levels of
+sharded directories::
+
+    UPLOAD_DIR/objects/ab/cd/abcd…ef.jpg
+
+A download streams into ``UPLOAD_DIR/tmp`` (aiogram writes it with
+aiofiles), is hashed on a worker thread and is then renamed into place with
+``os.replace`` — readers never see a partial file,
+and two concurrent uploads of the same image both end up with the same
+complete object. Sending the same picture again (by any user) costs no extra
+disk space.
+
+``Photo`` rows reference objects by ``content_hash``; an object is only
+deleted by ``release()`` once no unpurged row references it any more and it
+hasn't been uploaded again recently (uploads still waiting for their booking
+only live in FSM data, so the grace period protects them).
+
+Each upload also leaves an empty marker in ``UPLOAD_DIR/pending/<date>/``.
+``sweep_pending()`` walks only the day folders older than
+``PHOTO_PENDING_TTL_DAYS`` and releases their objects, so uploads from funnels
+that never reached a booking are removed without scanning the whole store.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from aiogram import Bot
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import settings
+from db.models import Photo
+
+logger = logging.getLogger(__name__)
+
+# Files deleted per thread-pool task
+DELETE_CHUNK_SIZE = 100
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    content_hash: str
+    path: Path
+    deduplicated: bool      # the object was already in the store
+
+
+class PhotoStore:
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.tmp_dir = self.root / "tmp"
+        self.pending_dir = self.root / "pending"
+
+    def path_for(self, content_hash: str) -> Path:
+        return self.objects_dir / content_hash[:2] / content_hash[2:4] / f"{content_hash}.jpg"
+
+    async def download(self, bot: Bot, file_id: str) -> StoredObject:
+        """Stream a Telegram file into the store."""
+        await asyncio.to_thread(self.tmp_dir.mkdir, parents=True, exist_ok=True)
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        try:
+            # A path destination: aiogram streams the chunks to it with aiofiles
+            await bot.download(file_id, destination=tmp_path)
+            return await asyncio.to_thread(self._commit_download, tmp_path)
+        finally:
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+
+    async def put(self, data: bytes) -> StoredObject:
+        """Store bytes already in memory."""
+        return await asyncio.to_thread(self._put_bytes, data)
+
+    async def release(
+        self, session: AsyncSession, content_hashes: Iterable[str], grace: Optional[float] = None,
+    ) -> int:
+        """Delete the objects no unpurged ``Photo`` row references any more; the number deleted.
+
+        Runs in the caller's transaction, so rows it has just marked purged
+        no longer count as references.
+        """
+        hashes = set(filter(None, content_hashes))
+        if not hashes:
+            return 0
+        result = await session.execute(
+            select(Photo.content_hash)
+            .where(Photo.content_hash.in_(hashes), Photo.purged_at.is_(None))
+            .distinct()
+        )
+        unreferenced = hashes - set(result.scalars())
+        cutoff = time.time() - (self.grace_seconds if grace is None else grace)
+        return await delete_files([self.path_for(h) for h in unreferenced], older_than=cutoff)
+
+    async def sweep_pending(self, session: AsyncSession, today: Optional[date] = None) -> int:
+        """Release uploads of expired pending days and drop those folders; the number of files deleted."""
+        last_kept = (today or date.today()) - timedelta(days=settings.PHOTO_PENDING_TTL_DAYS)
+        removed = 0
+        for day_dir in await asyncio.to_thread(self._expired_pending_days, last_kept):
+            hashes = await asyncio.to_thread(lambda: [p.name for p in day_dir.iterdir()])
+            removed += await self.release(session, hashes)
+            await asyncio.to_thread(shutil.rmtree, day_dir, True)
+        removed += await asyncio.to_thread(self._sweep_leftovers, last_kept)
+        return removed
+
+    @property
+    def grace_seconds(self) -> float:
+        """Unreferenced objects uploaded more recently may belong to a booking in progress."""
+        return settings.PHOTO_PENDING_TTL_DAYS * 24 * 3600
+
+    # ------------------------------------------------------------------
+
+    def _put_bytes(self, data: bytes) -> StoredObject:
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        try:
+            tmp_path.write_bytes(data)
+            return self._commit(tmp_path, hashlib.sha256(data).hexdigest())
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _commit_download(self, tmp_path: Path) -> StoredObject:
+        sha256 = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                sha256.update(chunk)
+        stored = self._commit(tmp_path, sha256.hexdigest())
+        self._mark_pending(stored.content_hash)
+        return stored
+
+    def _commit(self, tmp_path: Path, content_hash: str) -> StoredObject:
+        final = self.path_for(content_hash)
+        if final.exists():
+            # Already stored: refresh mtime so release() keeps it through the grace period
+            os.utime(final)
+            return StoredObject(content_hash, final, deduplicated=True)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, final)
+        return StoredObject(content_hash, final, deduplicated=False)
+
+    def _mark_pending(self, content_hash: str) -> None:
+        day_dir = self.pending_dir / date.today().isoformat()
+        day_dir.mkdir(parents=True, exist_ok=True)
+        (day_dir / content_hash).touch()
+
+    def _expired_pending_days(self, last_kept: date) -> List[Path]:
+        if not self.pending_dir.exists():
+            return []
+        expired = []
+        for day_dir in self.pending_dir.iterdir():
+            try:
+                if date.fromisoformat(day_dir.name) < last_kept:
+                    expired.append(day_dir)
+            except ValueError:
+                continue
+        return expired
+
+    def _sweep_leftovers(self, last_kept: date) -> int:
+        """Stale ``tmp/*.part`` files and pre-store ``<user>/pending`` folders."""
+        cutoff = time.mktime(last_kept.timetuple())
+        removed = 0
+        candidates = list(self.tmp_dir.glob("*.part")) if self.tmp_dir.exists() else []
+        # Old layout: UPLOAD_DIR/<user_db_id>/pending/<file>.jpg
+        candidates += [p for p in self.root.glob("[0-9]*/pending") if p.is_dir()]
+        for path in candidates:
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+                if path.is_dir():
+                    removed += sum(1 for _ in path.iterdir())
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Cannot remove {path}: {e}")
+        return removed
+
+
+async def delete_files(paths: List[Path], older_than: Optional[float] = None) -> int:
+    """Delete files in parallel chunks on the default thread pool; the number deleted.
+
+    With ``older_than`` (a timestamp), files modified since then are kept.
+    Missing files are not an error — a previous, interrupted run may have
+    deleted them already.
+    """
+    def delete_chunk(chunk: List[Path]) -> int:
+        removed = 0
+        for path in chunk:
+            try:
+                if older_than is not None and path.stat().st_mtime >= older_than:
+                    continue
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Cannot remove {path}: {e}")
+        return removed
+
+    chunks = [paths[i:i + DELETE_CHUNK_SIZE] for i in range(0, len(paths), DELETE_CHUNK_SIZE)]
+    return sum(await asyncio.gather(*(asyncio.to_thread(delete_chunk, chunk) for chunk in chunks)))
+
+
+photo_store = PhotoStore(settings.UPLOAD_DIR)
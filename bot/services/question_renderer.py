@@ -0,0 +1,109 @@
+"""Pre-rendered question messages — text + keyboard built once per engine load."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from bot import keyboards, texts
+from bot.services.questionnaire_engine import Question, QuestionnaireEngine
+
+# Options longer than this are moved into the message as a numbered list
+LONG_OPTION_LEN = 40
+
+
+@dataclass(frozen=True)
+class RenderedQuestion:
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+
+
+def _format_options(text: str, opts: List[str]) -> Tuple[str, List[str] | None]:
+    """Number long options in the text and use the numbers as button labels."""
+    if any(len(o) > LONG_OPTION_LEN for o in opts):
+        lines = [text, ""]
+        labels = []
+        for i, o in enumerate(opts, 1):
+            lines.append(f"{i}. {o}")
+            labels.append(str(i))
+        return "\n".join(lines), labels
+    return text, None
+
+
+class QuestionRenderer:
+    """Cache of (question, show_back) -> RenderedQuestion for one questionnaire.
+
+    Markups are shared between users, so they are never mutated — toggles
+    build a new markup that reuses every unchanged row.
+    """
+
+    def __init__(self, engine: QuestionnaireEngine) -> None:
+        self._rendered: Dict[Tuple[str, bool], RenderedQuestion] = {}
+        self._options: Dict[str, List[str]] = {}
+        self._labels: Dict[str, List[str]] = {}
+        for q in engine.questions.values():
+            self._options[q.id] = q.options
+            self._labels[q.id] = self._button_labels(q)
+            for show_back in (False, True):
+                rendered = self._render(q, show_back)
+                if rendered:
+                    self._rendered[(q.id, show_back)] = rendered
+
+    def render(self, q_id: str, show_back: bool) -> Optional[RenderedQuestion]:
+        return self._rendered.get((q_id, show_back))
+
+    def toggle(
+        self,
+        q_id: str,
+        markup: Optional[InlineKeyboardMarkup],
+        idx: int,
+        selected: set[str],
+        show_back: bool,
+    ) -> InlineKeyboardMarkup:
+        """Flip the mark of option ``idx`` in an already-sent multi keyboard."""
+        options = self._options.get(q_id, [])
+        labels = self._labels.get(q_id, [])
+        rows = markup.inline_keyboard if markup else None
+        if not rows or idx >= len(options) or idx >= len(rows):
+            # Unknown message layout — rebuild from scratch
+            return keyboards.multi_option_keyboard(
+                options, selected, show_back=show_back, labels=labels
+            )
+
+        mark = "☑" if options[idx] in selected else "☐"
+        button = rows[idx][0].model_copy(update={"text": f"{mark} {labels[idx]}"})
+        new_rows = list(rows)
+        new_rows[idx] = [button]
+        return InlineKeyboardMarkup(inline_keyboard=new_rows)
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _button_labels(q: Question) -> List[str]:
+        _, labels = _format_options("", q.options)
+        return labels or list(q.options)
+
+    @staticmethod
+    def _render(q: Question, show_back: bool) -> Optional[RenderedQuestion]:
+        if q.q_type == "single":
+            text, labels = _format_options(f"❓ {q.text}", q.options)
+            return RenderedQuestion(
+                text,
+                keyboards.single_option_keyboard(q.options, show_back=show_back, labels=labels),
+            )
+        if q.q_type == "multi":
+            text, labels = _format_options(f"❓ {q.text}", q.options)
+            return RenderedQuestion(
+                f"{text}\n\n{texts.QUESTIONNAIRE_MULTI_HINT}",
+                keyboards.multi_option_keyboard(q.options, show_back=show_back, labels=labels),
+            )
+        if q.q_type == "text":
+            return RenderedQuestion(f"❓ {q.text}\n\n{texts.QUESTIONNAIRE_TEXT_HINT}")
+        if q.q_type == "info":
+            return RenderedQuestion(
+                f"ℹ️ {q.text}",
+                keyboards.info_keyboard(show_back=show_back),
+            )
+        return None
@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+import heapq
 import re
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 
@@ -35,6 +36,17 @@ class LogicRule:
     condition_flag_value: bool = True       # Value expected for the flag
 
 
+# (rule position, target q_id, (flag name, expected value) or None)
+_CompiledRule = tuple[int, str, Optional[tuple[str, bool]]]
+
+
+@dataclass
+class _Transitions:
+    """Rules leaving one question, indexed for O(1) lookup by answer."""
+    any_answer: List[_CompiledRule] = field(default_factory=list)
+    by_answer: Dict[str, List[_CompiledRule]] = field(default_factory=dict)
+
+
 class QuestionnaireEngine:
     """Loads a questionnaire from a .md file, provides navigation."""
 
@@ -42,6 +54,8 @@ class QuestionnaireEngine:
         self.questions: Dict[str, Question] = {}
         self.question_order: List[str] = []
         self.rules: List[LogicRule] = []
+        self._transitions: Dict[str, _Transitions] = {}
+        self._successor: Dict[str, Optional[str]] = {}
         self._loaded = False
 
     # ------------------------------------------------------------------
@@ -49,11 +63,36 @@ class QuestionnaireEngine:
     # ------------------------------------------------------------------
 
     def load(self, md_file_path: str) -> None:
-        text = Path(md_file_path).read_text(encoding="utf-8")
+        self.loads(Path(md_file_path).read_text(encoding="utf-8"))
+
+    def loads(self, text: str) -> None:
+        """Parse a questionnaire from its markdown source."""
         self._parse_questions(text)
         self._parse_rules(text)
+        self._compile()
         self._loaded = True
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-JSON form of the parsed questionnaire (see ``from_dict``)."""
+        return {
+            "questions": [asdict(self.questions[q_id]) for q_id in self.question_order],
+            "rules": [asdict(rule) for rule in self.rules],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuestionnaireEngine":
+        """Rebuild an engine from ``to_dict`` output without re-parsing markdown."""
+        engine = cls()
+        for raw in data["questions"]:
+            triggers = [Trigger(**t) for t in raw.get("triggers", [])]
+            q = Question(**{**raw, "triggers": triggers})
+            engine.questions[q.id] = q
+            engine.question_order.append(q.id)
+        engine.rules = [LogicRule(**r) for r in data["rules"]]
+        engine._compile()
+        engine._loaded = True
+        return engine
+
     def get_first_question(self) -> Optional[Question]:
         if not self.question_order:
             return None
@@ -115,46 +154,30 @@ class QuestionnaireEngine:
         # (Be careful not to duplicate side effects if they were external, but here it's just dict update)
         self.execute_triggers(current_q_id, answer, context)
 
-        # 2. Check Logic Rules in order
-        for rule in self.rules:
-            if rule.from_q != current_q_id:
-                continue
-
-            # Check Flag condition
-            if rule.condition_flag:
-                flag_val = context.get(rule.condition_flag, False)
-                if flag_val != rule.condition_flag_value:
+        # 2. Check Logic Rules (compiled per question, original order preserved)
+        transitions = self._transitions.get(current_q_id)
+        if transitions:
+            candidates = [transitions.any_answer]
+            answer_rules = transitions.by_answer.get(answer)
+            if answer_rules:
+                candidates.append(answer_rules)
+            # Legacy gender hack: an answer-conditioned rule also matches the
+            # stored gender (routers branch on q_gender, not on their own answer)
+            gender = context.get("q_gender")
+            if gender is not None and gender != answer:
+                gender_rules = transitions.by_answer.get(gender)
+                if gender_rules:
+                    candidates.append(gender_rules)
+
+            for _, to_q, flag in heapq.merge(*candidates):
+                if flag and context.get(flag[0], False) != flag[1]:
                     continue  # Flag mismatch, skip rule
-
-            # Check Answer condition
-            if rule.condition_answer is not None:
-                # For basic compat, check against "q_gender" in context for router questions
-                # OR check against current 'answer' if it matches? 
-                # Usually rules are "From Q1 to Q2".
-                # Legacy special case: branching based on PREVIOUS question answer stored in context
-                # (like gender).
-                
-                # If rule depends on specific answer string:
-                # We check if context[current_q_id] matches, or 'answer' matches.
-                # But 'answer' is the *current* answer being submitted.
-                if rule.condition_answer == answer:
-                     pass # Match
-                elif context.get("q_gender") == rule.condition_answer:
-                     pass # Match (legacy gender hack)
-                else:
-                     continue # Mismatch
-
-            # If we got here, all conditions passed
-            return self.questions.get(rule.to_q)
+                return self.questions.get(to_q)
 
         # 3. Fallback: Sequential order
-        if current_q_id in self.question_order:
-            try:
-                idx = self.question_order.index(current_q_id)
-                if idx + 1 < len(self.question_order):
-                    return self.questions[self.question_order[idx + 1]]
-            except ValueError:
-                pass
+        next_q_id = self._successor.get(current_q_id)
+        if next_q_id is not None:
+            return self.questions[next_q_id]
 
         return None
 
@@ -167,12 +190,38 @@ class QuestionnaireEngine:
         # We assume if it's info, it's end.
         return False
 
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+
+    def _compile(self) -> None:
+        """Index rules by source question and precompute sequential successors."""
+        self._transitions = {}
+        for pos, rule in enumerate(self.rules):
+            flag = (
+                (rule.condition_flag, rule.condition_flag_value)
+                if rule.condition_flag else None
+            )
+            compiled: _CompiledRule = (pos, rule.to_q, flag)
+            transitions = self._transitions.setdefault(rule.from_q, _Transitions())
+            if rule.condition_answer is None:
+                transitions.any_answer.append(compiled)
+            else:
+                transitions.by_answer.setdefault(rule.condition_answer, []).append(compiled)
+
+        self._successor = {}
+        for idx, q_id in enumerate(self.question_order):
+            # setdefault: duplicated ids keep the successor of their first occurrence
+            next_q_id = self.question_order[idx + 1] if idx + 1 < len(self.question_order) else None
+            self._successor.setdefault(q_id, next_q_id)
+
     # ------------------------------------------------------------------
     # Parsers
     # ------------------------------------------------------------------
 
     # Regex for Question block
     _QUESTION_HEADER_RE = re.compile(r"^###\s+\d+\.\s+`(\w+)`\s*$", re.MULTILINE)
+    _BLOCK_HEADER_RE = re.compile(r"^(?:\d+\.\s+)?`?(\w+)`?\s*$", re.MULTILINE)
     _FIELD_RE = re.compile(r"^\*\s+\*\*(\w+):\*\*\s*(.+)$", re.MULTILINE)
     
     # Regex for Triggers: "*   If answer == "Val" set flag"
@@ -196,13 +245,12 @@ class QuestionnaireEngine:
             if not block.strip():
                 continue
             
-            # Re-add ### for regex if needed, or just parse body
-            # block starts with "1. `id`"
-            header_match = re.match(r"^(\d+)\.\s+`(\w+)`", block)
+            # Block starts with "1. `id`" or just "id"
+            header_match = self._BLOCK_HEADER_RE.match(block)
             if not header_match:
                 continue
             
-            q_id = header_match.group(2)
+            q_id = header_match.group(1)
             
             # Extract fields
             q_text = ""
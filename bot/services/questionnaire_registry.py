@@ -0,0 +1,219 @@
+"""Questionnaire registry — precompiled bundle with mtime-checked hot reload.
+
+The ``.md`` specs are compiled into ``questionnaires.bundle.json`` (schema
+versioned). At startup the bundle is loaded eagerly; a questionnaire is
+recompiled from markdown only when its source changed. While the bot runs,
+source mtimes are re-checked at most every ``reload_interval`` seconds and
+changed questionnaires are swapped in atomically.
+
+Every compiled questionnaire has a content version. Sessions store the
+version they started on and keep getting that exact engine; the bundle keeps
+the last ``KEEP_VERSIONS`` versions so this survives restarts too.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from bot.services.question_renderer import QuestionRenderer
+from bot.services.questionnaire_engine import Question, QuestionnaireEngine
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_SCHEMA_VERSION = 1
+KEEP_VERSIONS = 5
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+BUNDLE_FILE = BASE_DIR / "questionnaires.bundle.json"
+
+# questionnaire phase -> .md file name (without extension)
+QUESTIONNAIRE_MAP = {
+    "basic": "basic_questionnaire",
+    "ayurved_m": "ayurved_m_questionnaire",
+    "ayurved_j": "ayurved_j_questionnaire",
+}
+
+
+@dataclass(frozen=True)
+class CompiledQuestionnaire:
+    name: str
+    version: str
+    engine: QuestionnaireEngine
+    renderer: QuestionRenderer
+
+
+class QuestionnaireRegistry:
+    def __init__(
+        self,
+        base_dir: Path = BASE_DIR,
+        bundle_path: Path = BUNDLE_FILE,
+        reload_interval: float = 2.0,
+    ) -> None:
+        self.base_dir = Path(base_dir)
+        self.bundle_path = Path(bundle_path)
+        self.reload_interval = reload_interval
+        self._current: Dict[str, CompiledQuestionnaire] = {}
+        self._versions: Dict[tuple[str, str], CompiledQuestionnaire] = {}
+        # Bundle contents: name -> {"current", "source_mtime", "versions": {v: engine dict}}
+        self._bundle: Dict[str, dict] = {}
+        self._last_check = 0.0
+        # q_id -> (phase key, Question) over the current versions, see question_index()
+        self._index: Dict[str, Tuple[str, Question]] = {}
+        self._index_versions: tuple = ()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def load(self) -> None:
+        """Load the bundle and recompile whatever is stale. Call at startup."""
+        self._bundle = self._read_bundle()
+        changed = False
+        for name in QUESTIONNAIRE_MAP.values():
+            entry = self._bundle.get(name)
+            mtime = self._source_mtime(name)
+            if entry and mtime is not None and entry["source_mtime"] == mtime:
+                for version, raw in entry["versions"].items():
+                    self._remember(name, version, QuestionnaireEngine.from_dict(raw))
+                self._current[name] = self._versions[(name, entry["current"])]
+            else:
+                changed |= self._compile(name, mtime)
+        if changed:
+            self._write_bundle()
+        self._last_check = time.monotonic()
+        logger.info(
+            "Questionnaires loaded: "
+            + ", ".join(f"{n}@{q.version} ({len(q.engine.questions)} q)" for n, q in self._current.items())
+        )
+
+    def get(self, name: str, version: Optional[str] = None) -> CompiledQuestionnaire:
+        """Return questionnaire ``name`` — pinned to ``version`` if it is still known."""
+        self.maybe_reload()
+        if version:
+            pinned = self._versions.get((name, version))
+            if pinned:
+                return pinned
+        if name not in self._current:
+            self._compile(name, self._source_mtime(name))
+        if version:
+            # Dropped from the bundle (older than the last KEEP_VERSIONS) before a restart
+            logger.warning(
+                f"Questionnaire {name}@{version} is no longer available, "
+                f"continuing on {self._current[name].version}"
+            )
+        return self._current[name]
+
+    def question_index(self) -> Dict[str, Tuple[str, Question]]:
+        """Map every question id to ``(phase key, Question)`` across all questionnaires.
+
+        Built once per set of current versions. A question id present in several
+        questionnaires resolves to the first phase in ``QUESTIONNAIRE_MAP`` order.
+        """
+        self.maybe_reload()
+        compiled = [(key, self.get(name)) for key, name in QUESTIONNAIRE_MAP.items()]
+        versions = tuple(q.version for _, q in compiled)
+        if versions != self._index_versions:
+            index: Dict[str, Tuple[str, Question]] = {}
+            for key, questionnaire in compiled:
+                for q_id, question in questionnaire.engine.questions.items():
+                    index.setdefault(q_id, (key, question))
+            self._index, self._index_versions = index, versions
+        return self._index
+
+    def maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        self._last_check = now
+
+        changed = False
+        for name in QUESTIONNAIRE_MAP.values():
+            mtime = self._source_mtime(name)
+            entry = self._bundle.get(name)
+            if mtime is not None and (not entry or entry["source_mtime"] != mtime):
+                changed |= self._compile(name, mtime)
+        if changed:
+            self._write_bundle()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _source_path(self, name: str) -> Path:
+        return self.base_dir / f"{name}.md"
+
+    def _source_mtime(self, name: str) -> Optional[float]:
+        try:
+            return os.stat(self._source_path(name)).st_mtime
+        except OSError:
+            return None
+
+    def _compile(self, name: str, mtime: Optional[float]) -> bool:
+        """Parse ``name`` from markdown; returns True if the bundle needs writing."""
+        try:
+            source = self._source_path(name).read_text(encoding="utf-8")
+            engine = QuestionnaireEngine()
+            engine.loads(source)
+        except Exception as e:
+            # Keep serving the previous version if the edited file is broken
+            logger.error(f"Failed to compile questionnaire {name}: {e}", exc_info=True)
+            return False
+        if not engine.questions:
+            logger.error(f"Questionnaire {name} has no questions — keeping previous version")
+            return False
+
+        version = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+        compiled = self._remember(name, version, engine)
+
+        entry = self._bundle.setdefault(name, {"versions": {}})
+        entry["versions"].pop(version, None)
+        entry["versions"][version] = engine.to_dict()
+        while len(entry["versions"]) > KEEP_VERSIONS:
+            entry["versions"].pop(next(iter(entry["versions"])))
+        entry["current"] = version
+        entry["source_mtime"] = mtime
+
+        previous = self._current.get(name)
+        self._current[name] = compiled
+        if previous and previous.version != version:
+            logger.info(f"Questionnaire {name} reloaded: {previous.version} -> {version}")
+        return True
+
+    def _remember(self, name: str, version: str, engine: QuestionnaireEngine) -> CompiledQuestionnaire:
+        compiled = CompiledQuestionnaire(name, version, engine, QuestionRenderer(engine))
+        self._versions[(name, version)] = compiled
+        return compiled
+
+    def _read_bundle(self) -> Dict[str, dict]:
+        try:
+            raw = json.loads(self.bundle_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable questionnaire bundle {self.bundle_path}: {e}")
+            return {}
+        if raw.get("schema") != BUNDLE_SCHEMA_VERSION:
+            logger.info("Questionnaire bundle schema changed — rebuilding")
+            return {}
+        return raw.get("questionnaires", {})
+
+    def _write_bundle(self) -> None:
+        payload = {"schema": BUNDLE_SCHEMA_VERSION, "questionnaires": self._bundle}
+        tmp_path = self.bundle_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.bundle_path)
+        except OSError as e:
+            # Read-only image: the in-memory registry still works
+            logger.warning(f"Cannot write questionnaire bundle {self.bundle_path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+
+registry = QuestionnaireRegistry()
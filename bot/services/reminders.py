@@ -0,0 +1,69 @@
+"""Reminders about upcoming consultations.
+
+Run periodically on ``bot.scheduler``: every active booking whose slot starts
+within ``BOOKING_REMINDER_HOURS`` gets one message. A booking is claimed by
+setting ``reminder_sent_at`` with a conditional UPDATE before anything is
+sent, so overlapping runs (or a new leader taking over mid-run) never remind
+twice.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+from bot import texts
+from bot.services.conference_links import MANUAL_LINK_FALLBACK
+from bot.services.delivery import delivery
+from bot.services.slot_service import slot_now
+from config.settings import settings
+from db.base import async_session
+from db.models import Booking, BookingStatus, Slot, User
+
+logger = logging.getLogger(__name__)
+
+# Bookings made just now don't need a reminder on top of the confirmation
+MIN_BOOKING_AGE = timedelta(hours=1)
+
+
+async def send_booking_reminders() -> int:
+    """Remind users about consultations starting soon; the number of reminders sent."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Slot times are wall-clock МСК as the admin entered them, not UTC
+    slot_clock = slot_now()
+    async with async_session() as session:
+        result = await session.execute(
+            select(Booking.id, User.telegram_id, Slot.datetime_utc, Booking.conference_link)
+            .join(Slot, Booking.slot_id == Slot.id)
+            .join(User, Booking.user_id == User.id)
+            .where(
+                Booking.status == BookingStatus.active,
+                Booking.reminder_sent_at.is_(None),
+                Booking.created_at < now - MIN_BOOKING_AGE,
+                Slot.datetime_utc > slot_clock,
+                Slot.datetime_utc <= slot_clock + timedelta(hours=settings.BOOKING_REMINDER_HOURS),
+            )
+        )
+        due = {row.id: row for row in result}
+        if not due:
+            return 0
+
+        claimed = await session.execute(
+            update(Booking)
+            .where(Booking.id.in_(due), Booking.reminder_sent_at.is_(None))
+            .values(reminder_sent_at=now)
+            .returning(Booking.id)
+        )
+        booking_ids = list(claimed.scalars())
+        await session.commit()
+
+    for booking_id in booking_ids:
+        row = due[booking_id]
+        text = texts.BOOKING_REMINDER.format(date=row.datetime_utc.strftime("%d.%m.%Y %H:%M"))
+        if row.conference_link and row.conference_link != MANUAL_LINK_FALLBACK:
+            text += texts.BOOKING_REMINDER_LINK.format(link=row.conference_link)
+        delivery.send_text(row.telegram_id, text)
+    logger.info(f"Sent {len(booking_ids)} booking reminder(s)")
+    return len(booking_ids)
@@ -0,0 +1,181 @@
+"""Recurring schedules — generate many slots at once from one line of text.
+
+Format: ``<days> <from>-<to> <weeks> [duration]``, for example::
+
+    пн-пт 10:00-17:00 8          # Mon–Fri, 10:00…16:00 starts, 8 weeks, 60 min
+    пн,ср,пт 09:00-13:00 4 30    # three days a week, 30-minute slots
+
+A plan is built first (dry run): slots that overlap existing ones are
+reported as conflicts, holidays and past times are skipped. Applying the
+plan re-checks conflicts and inserts everything in one bulk INSERT.
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.services.slot_service import SlotService
+from db.models import Slot
+
+DEFAULT_DURATION = 60
+MIN_DURATION, MAX_DURATION = 30, 60
+MAX_WEEKS = 26
+
+WEEKDAYS = {
+    "пн": 0, "вт": 1, "ср": 2, "чт": 3, "пт": 4, "сб": 5, "вс": 6,
+    "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
+}
+EVERY_DAY = {"ежедневно", "daily"}
+
+_TIME_RANGE_RE = re.compile(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$")
+
+
+class ScheduleError(ValueError):
+    """Schedule text can't be parsed; the message is shown to the admin."""
+
+
+@dataclass(frozen=True)
+class Schedule:
+    weekdays: frozenset[int]
+    start: dt_time
+    end: dt_time
+    weeks: int
+    duration: int = DEFAULT_DURATION
+
+    def occurrences(self, first_day: date) -> Iterable[datetime]:
+        """Slot start times from ``first_day`` for ``weeks`` weeks."""
+        step = timedelta(minutes=self.duration)
+        for offset in range(self.weeks * 7):
+            day = first_day + timedelta(days=offset)
+            if day.weekday() not in self.weekdays:
+                continue
+            start = datetime.combine(day, self.start)
+            end = datetime.combine(day, self.end)
+            while start + step <= end:
+                yield start
+                start += step
+
+
+@dataclass
+class SchedulePlan:
+    schedule: Schedule
+    new: List[datetime] = field(default_factory=list)
+    conflicts: List[datetime] = field(default_factory=list)
+    holidays: Set[date] = field(default_factory=set)     # holidays that were skipped
+
+
+def parse_schedule(text: str) -> Schedule:
+    parts = text.lower().split()
+    if len(parts) not in (3, 4):
+        raise ScheduleError("Ожидается: <дни> <с>-<до> <недель> [длительность]")
+    days_part, time_part, weeks_part = parts[:3]
+
+    weekdays = _parse_weekdays(days_part)
+
+    match = _TIME_RANGE_RE.match(time_part)
+    if not match:
+        raise ScheduleError("Время указывается как ЧЧ:ММ-ЧЧ:ММ, например 10:00-17:00")
+    try:
+        start = dt_time(int(match[1]), int(match[2]))
+        end = dt_time(int(match[3]), int(match[4]))
+    except ValueError:
+        raise ScheduleError("Неверное время")
+    if end <= start:
+        raise ScheduleError("Время окончания должно быть позже начала")
+
+    if not weeks_part.isdigit() or not 1 <= int(weeks_part) <= MAX_WEEKS:
+        raise ScheduleError(f"Количество недель — число от 1 до {MAX_WEEKS}")
+
+    duration = DEFAULT_DURATION
+    if len(parts) == 4:
+        if not parts[3].isdigit() or not MIN_DURATION <= int(parts[3]) <= MAX_DURATION:
+            raise ScheduleError(f"Длительность должна быть от {MIN_DURATION} до {MAX_DURATION} минут")
+        duration = int(parts[3])
+
+    return Schedule(frozenset(weekdays), start, end, int(weeks_part), duration)
+
+
+def _parse_weekdays(text: str) -> Set[int]:
+    if text in EVERY_DAY:
+        return set(range(7))
+    weekdays: Set[int] = set()
+    for item in text.split(","):
+        first, _, last = item.partition("-")
+        if first not in WEEKDAYS or (last and last not in WEEKDAYS):
+            raise ScheduleError(f"Неизвестный день недели: {item}")
+        lo, hi = WEEKDAYS[first], WEEKDAYS[last or first]
+        # пт-пн wraps around the weekend
+        weekdays.update(range(lo, hi + 1) if lo <= hi else [*range(lo, 7), *range(0, hi + 1)])
+    return weekdays
+
+
+class ScheduleService:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def plan(
+        self,
+        schedule: Schedule,
+        holidays: Iterable[date] = (),
+        first_day: Optional[date] = None,
+    ) -> SchedulePlan:
+        """Dry run: what ``apply`` would create, and what it would skip."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        first_day = first_day or now.date()
+        holidays = set(holidays)
+        plan = SchedulePlan(schedule)
+
+        candidates = []
+        for start in schedule.occurrences(first_day):
+            if start.date() in holidays:
+                plan.holidays.add(start.date())
+            elif start > now:
+                candidates.append(start)
+        if not candidates:
+            return plan
+
+        # One query for every existing slot that could overlap the range
+        result = await self.session.execute(
+            select(Slot.datetime_utc, Slot.duration_minutes)
+            .where(
+                Slot.is_deleted.is_(False),
+                Slot.datetime_utc > candidates[0] - timedelta(days=1),
+                Slot.datetime_utc < candidates[-1] + timedelta(minutes=schedule.duration),
+            )
+            .order_by(Slot.datetime_utc)
+        )
+        existing = [(start, start + timedelta(minutes=minutes)) for start, minutes in result.all()]
+        starts = [start for start, _ in existing]
+        longest = max((end - start for start, end in existing), default=timedelta(0))
+
+        step = timedelta(minutes=schedule.duration)
+        for start in candidates:
+            end = start + step
+            # Existing slots starting in (start - longest, end) are the only ones that can overlap
+            i = bisect.bisect_right(starts, start - longest)
+            j = bisect.bisect_left(starts, end)
+            if any(s < end and start < e for s, e in existing[i:j]):
+                plan.conflicts.append(start)
+            else:
+                plan.new.append(start)
+        return plan
+
+    async def apply(
+        self,
+        schedule: Schedule,
+        admin_id: int,
+        holidays: Iterable[date] = (),
+        first_day: Optional[date] = None,
+    ) -> SchedulePlan:
+        """Re-plan against the current slots and bulk-insert the new ones."""
+        plan = await self.plan(schedule, holidays, first_day)
+        if plan.new:
+            await SlotService(self.session).create_slots(plan.new, schedule.duration, admin_id)
+        return plan
@@ -0,0 +1,187 @@
+"""In-process cache for slot availability, invalidated on every slot change.
+
+The slot picker and the admin lists read the same few queries over and over,
+while slots only change when one is created, booked or deleted. Results are
+cached per key for ``SLOT_CACHE_TTL`` seconds and dropped as soon as a change
+is committed. Concurrent misses for one key share a single load.
+
+Invalidation is generation-based: ``invalidate()`` bumps the generation, and
+a load that started before the bump is returned to its caller but never
+stored. With several bot processes on PostgreSQL, every change also sends
+``NOTIFY slot_cache`` in its transaction; ``start_listener()`` subscribes to
+it so the other processes drop their copies too. The listening connection is
+reopened with backoff when it drops, and the cache is cleared on every
+(re)connect since notifications sent in between are lost. LISTEN needs a
+session-mode connection straight to PostgreSQL, not pgbouncer in transaction mode.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "slot_cache"
+# How often the listener checks its connection; reconnect delays double up to the max
+LISTENER_CHECK_INTERVAL = 15.0
+LISTENER_RETRY_DELAY = 1.0
+LISTENER_RETRY_MAX_DELAY = 60.0
+
+
+@dataclass(frozen=True)
+class CachedSlot:
+    """Read-only copy of a ``Slot`` row, safe to share between sessions."""
+
+    id: int
+    datetime_utc: datetime
+    duration_minutes: int
+    is_booked: bool
+
+    @classmethod
+    def from_slot(cls, slot) -> "CachedSlot":
+        return cls(slot.id, slot.datetime_utc, slot.duration_minutes, slot.is_booked)
+
+
+class SlotCache:
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._generation = 0
+        # key -> (generation, expires_at, value)
+        self._entries: Dict[Hashable, tuple[int, float, Any]] = {}
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._listener = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._origin = f"{os.getpid()}-{id(self)}"
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self._lookup(key)
+        if value is not None:
+            return value
+
+        if len(self._locks) > self.max_entries:
+            self._locks = {k: lock for k, lock in self._locks.items() if lock.locked()}
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            generation = self._generation
+            value = await loader()
+            if generation == self._generation:
+                if len(self._entries) >= self.max_entries:
+                    # Paged keys: evict the oldest entry
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (generation, time.monotonic() + self.ttl, value)
+            return value
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def discard(self, key: Hashable) -> None:
+        """Drop one stale entry (e.g. its first slot has started) without a new generation."""
+        self._entries.pop(key, None)
+
+    def invalidate_on_commit(self, session: AsyncSession) -> None:
+        """Drop the cache once ``session`` commits (slot changes must be visible first)."""
+        sync_session = session.sync_session
+        if sync_session.info.get("slot_cache_pending"):
+            return
+        sync_session.info["slot_cache_pending"] = True
+
+        def _after_commit(_session) -> None:
+            _session.info.pop("slot_cache_pending", None)
+            self.invalidate()
+
+        event.listen(sync_session, "after_commit", _after_commit, once=True)
+
+    async def publish(self, session: AsyncSession) -> None:
+        """Tell other processes to invalidate; delivered by PostgreSQL at commit."""
+        if session.bind.dialect.name != "postgresql":
+            return
+        await session.execute(
+            text("SELECT pg_notify(:channel, :origin)"),
+            {"channel": NOTIFY_CHANNEL, "origin": self._origin},
+        )
+
+    async def start_listener(self, dsn: str) -> None:
+        """Subscribe to invalidations from other processes (PostgreSQL only)."""
+        dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self._listener_task = asyncio.create_task(self._listen(dsn), name="slot-cache-listener")
+
+    async def stop_listener(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            await asyncio.gather(self._listener_task, return_exceptions=True)
+            self._listener_task = None
+        await self._close_listener()
+
+    # ------------------------------------------------------------------
+
+    async def _listen(self, dsn: str) -> None:
+        import asyncpg
+
+        delay = LISTENER_RETRY_DELAY
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._listener = await asyncpg.connect(dsn)
+                self._listener.add_termination_listener(lambda _conn: lost.set())
+                await self._listener.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                # Changes made while we weren't listening were never announced to us
+                self.invalidate()
+                logger.info(f"Slot cache listening on channel {NOTIFY_CHANNEL}")
+                delay = LISTENER_RETRY_DELAY
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), LISTENER_CHECK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # A half-open TCP connection never fires the termination listener
+                        await self._listener.fetchval("SELECT 1", timeout=LISTENER_CHECK_INTERVAL / 2)
+                logger.warning("Slot cache listener connection closed, reconnecting")
+            except Exception as e:
+                logger.warning(f"Slot cache listener failed: {e}; retrying in {delay:g}s")
+            await self._close_listener()
+            # Nothing heard while disconnected: don't serve entries that may be stale
+            self.invalidate()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTENER_RETRY_MAX_DELAY)
+
+    async def _close_listener(self) -> None:
+        conn, self._listener = self._listener, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+
+    def _lookup(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        generation, expires_at, value = entry
+        if generation != self._generation or time.monotonic() >= expires_at:
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        if payload != self._origin:
+            self.invalidate()
+
+
+slot_cache = SlotCache()
@@ -1,15 +1,77 @@
-"""Slot CRUD service."""
+"""Slot CRUD service.
+
+Reads of free/future slots go through ``slot_cache``; every write registers
+an invalidation that fires when its transaction commits. Slot lists are
+keyset-paginated (days by date, slots by ``(datetime_utc, id)``), so a page
+costs the same however many slots are open.
+"""
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import List, Optional
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import select
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import Date, func, insert, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.services.slot_cache import CachedSlot, slot_cache
 from db.models import Slot
 
+DAYS_PER_PAGE = 7
+SLOTS_PER_PAGE = 12
+
+# Keyset cursor for slot lists: (datetime_utc, id) of the slot at a page edge
+SlotCursor = Tuple[datetime, int]
+
+
+@dataclass(frozen=True)
+class SlotDay:
+    day: date
+    free: int                 # free slots on that day
+    first_start: datetime     # earliest free slot
+
+
+@dataclass(frozen=True)
+class DaysPage:
+    days: List[SlotDay] = field(default_factory=list)
+    prev_cursor: Optional[date] = None    # first day, if there are earlier days
+    next_cursor: Optional[date] = None    # last day, if there are later days
+
+
+@dataclass(frozen=True)
+class DayOccupancy:
+    free: int
+    booked: int
+
+
+@dataclass(frozen=True)
+class SlotPage:
+    slots: List[CachedSlot] = field(default_factory=list)
+    prev_cursor: Optional[SlotCursor] = None
+    next_cursor: Optional[SlotCursor] = None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def slot_now() -> datetime:
+    """Now on the clock admins enter slot times in: naive wall-clock time in ``TIMEZONE`` (МСК)."""
+    from bot.scheduler import local_timezone
+
+    return datetime.now(local_timezone()).replace(tzinfo=None)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min)
+
+
+def _as_date(value) -> date:
+    # SQLite returns date() as text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
 
 class SlotService:
     def __init__(self, session: AsyncSession) -> None:
@@ -24,56 +86,159 @@ class SlotService:
             created_by_admin_id=admin_id,
         )
         self.session.add(slot)
+        await self._slots_changed()
         await self.session.commit()
         await self.session.refresh(slot)
         return slot
 
-    async def get_available_slots(self) -> List[Slot]:
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        stmt = (
-            select(Slot)
-            .where(
-                Slot.is_booked.is_(False),
-                Slot.is_deleted.is_(False),
-                Slot.datetime_utc > now,
+    async def create_slots(self, starts: List[datetime], duration: int, admin_id: int) -> int:
+        """Insert many slots with one bulk INSERT and a single commit."""
+        if not starts:
+            return 0
+        await self.session.execute(
+            insert(Slot),
+            [
+                {"datetime_utc": start, "duration_minutes": duration, "created_by_admin_id": admin_id}
+                for start in starts
+            ],
+        )
+        await self._slots_changed()
+        await self.session.commit()
+        return len(starts)
+
+    async def get_available_slots_page(
+        self, cursor: Optional[SlotCursor] = None, backwards: bool = False,
+    ) -> SlotPage:
+        """Free future slots, a page at a time."""
+        async def load():
+            return await self._load_slot_page(self._available_query(), cursor, backwards)
+
+        return await self._cached(
+            ("available", cursor, backwards), load,
+            lambda page: page.slots[0].datetime_utc if page.slots else None,
+        )
+
+    # ------------------------------------------------------------------
+    # Slot picker: day -> time
+    # ------------------------------------------------------------------
+
+    async def get_day_picker(
+        self, cursor: Optional[date] = None, backwards: bool = False,
+    ) -> Tuple[DaysPage, InlineKeyboardMarkup]:
+        """One page of days with free slots plus its pre-rendered keyboard.
+
+        Without ``cursor`` starts from today; otherwise returns the days after
+        ``cursor`` (or before it if ``backwards``).
+        """
+        from bot import keyboards
+
+        async def load():
+            page = await self._load_days_page(cursor, backwards)
+            return page, keyboards.slot_days_keyboard(page)
+
+        return await self._cached(
+            ("days", cursor, backwards), load,
+            lambda value: value[0].days[0].first_start if value[0].days else None,
+        )
+
+    async def get_time_picker(
+        self, day: date, cursor: Optional[SlotCursor] = None, backwards: bool = False,
+    ) -> Tuple[SlotPage, InlineKeyboardMarkup]:
+        """Free slots of one day, a page at a time, plus the pre-rendered keyboard."""
+        from bot import keyboards
+
+        async def load():
+            stmt = self._available_query().where(
+                Slot.datetime_utc >= _day_start(day),
+                Slot.datetime_utc < _day_start(day + timedelta(days=1)),
             )
-            .order_by(Slot.datetime_utc)
+            page = await self._load_slot_page(stmt, cursor, backwards)
+            return page, keyboards.slot_times_keyboard(day, page)
+
+        return await self._cached(
+            ("day", day, cursor, backwards), load,
+            lambda value: value[0].slots[0].datetime_utc if value[0].slots else None,
+        )
+
+    # ------------------------------------------------------------------
+    # Admin
+    # ------------------------------------------------------------------
+
+    async def get_month_occupancy(self, year: int, month: int) -> Dict[int, DayOccupancy]:
+        """Free/booked slot counts per day of a month — one GROUP BY query, cached."""
+        async def load():
+            first = date(year, month, 1)
+            next_month = date(year + month // 12, month % 12 + 1, 1)
+            day = func.date(Slot.datetime_utc)
+            stmt = (
+                select(
+                    day,
+                    func.count().filter(Slot.is_booked.is_(False)),
+                    func.count().filter(Slot.is_booked.is_(True)),
+                )
+                .where(
+                    Slot.is_deleted.is_(False),
+                    Slot.datetime_utc >= _day_start(first),
+                    Slot.datetime_utc < _day_start(next_month),
+                )
+                .group_by(day)
+            )
+            return {
+                _as_date(d).day: DayOccupancy(free, booked)
+                for d, free, booked in (await self.session.execute(stmt)).all()
+            }
+
+        return await slot_cache.get_or_load(("month", year, month), load)
+
+    async def get_future_slots_page(
+        self, cursor: Optional[SlotCursor] = None, backwards: bool = False,
+    ) -> SlotPage:
+        """Non-deleted future slots (free and booked), a page at a time."""
+        async def load():
+            stmt = select(Slot).where(Slot.is_deleted.is_(False), Slot.datetime_utc > _utcnow())
+            return await self._load_slot_page(stmt, cursor, backwards)
+
+        return await self._cached(
+            ("future", cursor, backwards), load,
+            lambda page: page.slots[0].datetime_utc if page.slots else None,
         )
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
 
     async def get_slot_by_id(self, slot_id: int) -> Optional[Slot]:
         return await self.session.get(Slot, slot_id)
 
     async def book_slot(self, slot_id: int) -> Optional[Slot]:
-        slot = await self.get_slot_by_id(slot_id)
-        if slot and not slot.is_booked and not slot.is_deleted:
-            slot.is_booked = True
-            await self.session.commit()
-            return slot
-        return None
+        """Atomically mark a free slot as booked; ``None`` if someone else got it.
+
+        Does not commit — the caller commits together with the ``Booking`` row,
+        so the slot and its booking become visible in one transaction.
+        """
+        stmt = (
+            update(Slot)
+            .where(
+                Slot.id == slot_id,
+                Slot.is_booked.is_(False),
+                Slot.is_deleted.is_(False),
+            )
+            .values(is_booked=True)
+            .returning(Slot)
+        )
+        result = await self.session.execute(stmt)
+        slot = result.scalar_one_or_none()
+        if slot:
+            await self._slots_changed()
+        return slot
 
     async def soft_delete_slot(self, slot_id: int) -> bool:
         slot = await self.get_slot_by_id(slot_id)
         if slot and not slot.is_booked:
             slot.is_deleted = True
+            await self._slots_changed()
             await self.session.commit()
             return True
         return False
 
-    async def get_future_slots(self) -> List[Slot]:
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        stmt = (
-            select(Slot)
-            .where(Slot.is_deleted.is_(False), Slot.datetime_utc > now)
-            .order_by(Slot.datetime_utc)
-        )
-        result = await self.session.execute(stmt)
-        return list(result.scalars().all())
-
     async def get_slots_for_date(self, date) -> List[Slot]:
         """Get all non-deleted slots for a specific date."""
-        from datetime import time as dt_time
         day_start = datetime.combine(date, dt_time.min)
         day_end = datetime.combine(date, dt_time.max)
         stmt = (
@@ -87,3 +252,103 @@ class SlotService:
         )
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _available():
+        # "= false", not "IS false": the partial indexes are only used when
+        # the WHERE clause repeats their predicate
+        return (
+            Slot.is_booked == False,  # noqa: E712
+            Slot.is_deleted == False,  # noqa: E712
+            Slot.datetime_utc > _utcnow(),
+        )
+
+    @classmethod
+    def _available_query(cls):
+        return select(Slot).where(*cls._available())
+
+    async def _load_days_page(self, cursor: Optional[date], backwards: bool) -> DaysPage:
+        day = func.date(Slot.datetime_utc, type_=Date)
+        available = self._available()
+        # First the page's days: a range scan of ix_slots_available_day that
+        # stops after DAYS_PER_PAGE + 1 distinct days, however many lie beyond
+        stmt = select(day).distinct().where(*available)
+        if cursor:
+            stmt = stmt.where(day < cursor if backwards else day > cursor)
+        stmt = stmt.order_by(day.desc() if backwards else day.asc()).limit(DAYS_PER_PAGE + 1)
+        days = [_as_date(d) for d in (await self.session.scalars(stmt)).all()]
+        has_more = len(days) > DAYS_PER_PAGE
+        days = sorted(days[:DAYS_PER_PAGE])
+        if not days:
+            return DaysPage()
+
+        # Then the counts, for those days only
+        stmt = (
+            select(day, func.count(), func.min(Slot.datetime_utc))
+            .where(*available, day >= days[0], day <= days[-1])
+            .group_by(day)
+            .order_by(day)
+        )
+        rows = [
+            SlotDay(_as_date(d), free, first_start)
+            for d, free, first_start in (await self.session.execute(stmt)).all()
+        ]
+        if not rows:
+            return DaysPage()
+
+        earlier = has_more if backwards else cursor is not None
+        later = cursor is not None if backwards else has_more
+        return DaysPage(
+            days=rows,
+            prev_cursor=rows[0].day if earlier else None,
+            next_cursor=rows[-1].day if later else None,
+        )
+
+    async def _load_slot_page(self, stmt, cursor: Optional[SlotCursor], backwards: bool) -> SlotPage:
+        order_key = tuple_(Slot.datetime_utc, Slot.id)
+        if cursor:
+            stmt = stmt.where(order_key < tuple_(*cursor) if backwards else order_key > tuple_(*cursor))
+        if backwards:
+            stmt = stmt.order_by(Slot.datetime_utc.desc(), Slot.id.desc())
+        else:
+            stmt = stmt.order_by(Slot.datetime_utc.asc(), Slot.id.asc())
+
+        result = await self.session.execute(stmt.limit(SLOTS_PER_PAGE + 1))
+        rows = [CachedSlot.from_slot(s) for s in result.scalars()]
+        has_more = len(rows) > SLOTS_PER_PAGE
+        rows = rows[:SLOTS_PER_PAGE]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return SlotPage()
+
+        earlier = has_more if backwards else cursor is not None
+        later = cursor is not None if backwards else has_more
+        first, last = rows[0], rows[-1]
+        return SlotPage(
+            slots=rows,
+            prev_cursor=(first.datetime_utc, first.id) if earlier else None,
+            next_cursor=(last.datetime_utc, last.id) if later else None,
+        )
+
+    # ------------------------------------------------------------------
+    # Cache plumbing
+    # ------------------------------------------------------------------
+
+    async def _slots_changed(self) -> None:
+        """Invalidate cached slot lists here and in other processes once this transaction commits."""
+        await slot_cache.publish(self.session)
+        slot_cache.invalidate_on_commit(self.session)
+
+    async def _cached(self, key, load, earliest_start):
+        """``slot_cache.get_or_load`` that also drops the entry once its earliest slot has started."""
+        value = await slot_cache.get_or_load(key, load)
+        started = earliest_start(value)
+        if started is not None and started <= _utcnow():
+            slot_cache.discard(key)
+            value = await slot_cache.get_or_load(key, load)
+        return value
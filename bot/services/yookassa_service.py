@@ -1,15 +1,45 @@
-"""YooKassa payment service — adapted from yookassa_service.example.py."""
+"""YooKassa payment service — adapted from yookassa_service.example.py.
 
+One process-wide client (``get_yookassa()``) talks to the YooKassa REST API
+over a pooled aiohttp session: TLS connections are kept alive between calls
+instead of a new ``requests.Session`` per SDK call, nothing runs in the
+default thread pool, and every call has its own timeout. Request bodies are
+still built and validated with the SDK's ``PaymentRequestBuilder``.
+"""
+
+import re
 import uuid
 import logging
 import asyncio
 from typing import Optional, Dict, Any, List
+from urllib.parse import quote
 
-from yookassa import Configuration, Payment as YooKassaPayment
+import aiohttp
 from yookassa.domain.request.payment_request_builder import PaymentRequestBuilder
 from yookassa.domain.common.confirmation_type import ConfirmationType
 
-from config.settings import Settings
+from bot.metrics import Histogram
+from config.settings import Settings, settings
+
+API_URL = "https://api.yookassa.ru/v3"
+# YooKassa answers 202 while it is still processing; 5xx are transient
+RETRY_STATUSES = {202, 500, 502, 503, 504}
+# Payment ids are UUID-shaped, e.g. 2d8b3c1a-000f-5000-9000-1b5e3e9a2c1f
+PAYMENT_ID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+yookassa_request_seconds = Histogram(
+    "yookassa_request_seconds",
+    "YooKassa API call latency, including retries",
+    labels=("operation", "outcome"),
+)
+
+
+class YooKassaError(Exception):
+    pass
+
+
+class PaymentNotFound(YooKassaError):
+    """YooKassa answered 404: there is no such payment in this shop."""
 
 
 class YooKassaService:
@@ -23,18 +53,18 @@ class YooKassaService:
             logging.warning("YooKassa SHOP_ID or SECRET_KEY not configured.")
             self.configured = False
         else:
-            try:
-                Configuration.configure(
-                    self.settings.YOOKASSA_SHOP_ID,
-                    self.settings.YOOKASSA_SECRET_KEY,
-                )
-                self.configured = True
-                logging.info("YooKassa SDK configured.")
-            except Exception as e:
-                logging.error(f"Failed to configure YooKassa: {e}", exc_info=True)
-                self.configured = False
+            self.configured = True
+            logging.info("YooKassa client configured.")
 
         self.return_url = self.settings.YOOKASSA_RETURN_URL or "https://t.me/bot"
+        self.timeout = aiohttp.ClientTimeout(total=self.settings.YOOKASSA_TIMEOUT)
+        self.max_attempts = self.settings.YOOKASSA_MAX_ATTEMPTS
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     # ------------------------------------------------------------------
 
@@ -79,39 +109,45 @@ class YooKassaService:
 
             idempotence_key = str(uuid.uuid4())
             request = builder.build()
+            request.validate()
 
-            loop = asyncio.get_running_loop()
-            response = await loop.run_in_executor(
-                None, lambda: YooKassaPayment.create(request, idempotence_key)
+            response = await self._request(
+                "create_payment", "POST", "/payments", body=dict(request), idempotence_key=idempotence_key,
             )
-
+            confirmation = response.get("confirmation") or {}
             return {
-                "id": response.id,
-                "confirmation_url": (
-                    response.confirmation.confirmation_url if response.confirmation else None
-                ),
-                "status": response.status,
-                "paid": response.paid,
+                "id": response["id"],
+                "confirmation_url": confirmation.get("confirmation_url"),
+                "status": response["status"],
+                "paid": response.get("paid", False),
             }
         except Exception as e:
             logging.error(f"YooKassa payment creation failed: {e}", exc_info=True)
             return None
 
-    async def get_payment_info(self, payment_id: str) -> Optional[Dict[str, Any]]:
+    async def get_payment_info(self, payment_id: str, raise_not_found: bool = False) -> Optional[Dict[str, Any]]:
+        """Current payment status, or ``None`` if it can't be fetched.
+
+        With ``raise_not_found`` an unknown payment raises ``PaymentNotFound``
+        instead, so the caller can tell it from a temporary failure.
+        """
         if not self.configured:
             return None
         try:
-            loop = asyncio.get_running_loop()
-            info = await loop.run_in_executor(
-                None, lambda: YooKassaPayment.find_one(payment_id)
-            )
+            info = await self._request("get_payment", "GET", f"/payments/{quote(payment_id, safe='')}")
             if not info:
                 return None
             return {
-                "id": info.id,
-                "status": info.status,
-                "paid": info.paid,
+                "id": info["id"],
+                "status": info["status"],
+                "paid": info.get("paid", False),
+                "payment_method": info.get("payment_method") or {},
             }
+        except PaymentNotFound:
+            if raise_not_found:
+                raise
+            logging.error(f"YooKassa get info failed: payment {payment_id} not found")
+            return None
         except Exception as e:
             logging.error(f"YooKassa get info failed: {e}", exc_info=True)
             return None
@@ -120,9 +156,66 @@ class YooKassaService:
         if not self.configured:
             return False
         try:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, lambda: YooKassaPayment.cancel(payment_id))
+            await self._request(
+                "cancel_payment", "POST", f"/payments/{quote(payment_id, safe='')}/cancel", body={},
+                idempotence_key=str(uuid.uuid4()),
+            )
             return True
         except Exception as e:
             logging.error(f"YooKassa cancel failed: {e}", exc_info=True)
             return False
+
+    # ------------------------------------------------------------------
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily: a ClientSession must be made inside the running loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(self.settings.YOOKASSA_SHOP_ID, self.settings.YOOKASSA_SECRET_KEY),
+                connector=aiohttp.TCPConnector(limit=self.settings.YOOKASSA_POOL_SIZE, keepalive_timeout=60),
+                timeout=self.timeout,
+            )
+        return self._session
+
+    async def _request(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        body: Optional[Dict[str, Any]] = None,
+        idempotence_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Call the API; transient failures are retried with the same idempotence key."""
+        headers = {"Idempotence-Key": idempotence_key} if idempotence_key else {}
+        with yookassa_request_seconds.time(operation=operation, outcome="error") as labels:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    async with self._get_session().request(
+                        method, API_URL + path, json=body, headers=headers,
+                    ) as response:
+                        if response.status == 200:
+                            labels["outcome"] = "ok"
+                            return await response.json()
+                        if response.status == 404:
+                            labels["outcome"] = "not_found"
+                            raise PaymentNotFound(f"{method} {path}: HTTP 404")
+                        if response.status not in RETRY_STATUSES or attempt == self.max_attempts:
+                            raise YooKassaError(f"{method} {path}: HTTP {response.status} {await response.text()}")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt == self.max_attempts:
+                        labels["outcome"] = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                        raise YooKassaError(f"{method} {path}: {e!r}") from e
+                    logging.warning(f"YooKassa {operation} attempt {attempt} failed: {e!r}")
+                await asyncio.sleep(0.5 * attempt)
+        raise YooKassaError(f"{method} {path}: gave up after {self.max_attempts} attempts")
+
+
+_yookassa: Optional[YooKassaService] = None
+
+
+def get_yookassa() -> YooKassaService:
+    """Process-wide YooKassa client (created on first use)."""
+    global _yookassa
+    if _yookassa is None:
+        _yookassa = YooKassaService(settings)
+    return _yookassa
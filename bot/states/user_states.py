@@ -22,3 +22,5 @@ class AdminFSM(StatesGroup):
     entering_slot_duration = State()
     confirming_slot = State()
     deleting_slot = State()
+    entering_schedule = State()
+    confirming_schedule = State()
@@ -50,6 +50,10 @@ PAYMENT_SUCCESS = "✅ Оплата подтверждена! Давайте п
 
 PAYMENT_PENDING = "⏳ Оплата ещё не поступила. Попробуйте проверить позже."
 
+PAYMENT_CANCELLED = "❌ Оплата отменена. Используйте /start чтобы начать заново."
+
+PAYMENT_EXPIRED = "⌛ Время на оплату истекло. Используйте /start чтобы начать заново."
+
 PAYMENT_ERROR = "❌ Произошла ошибка при создании платежа. Попробуйте позже."
 
 ENTER_FIRST_NAME = "Введите ваше <b>имя</b>:"
@@ -97,6 +101,10 @@ BOOKING_CONFIRMED = (
     "Мы пришлём напоминание перед консультацией."
 )
 
+CONFERENCE_LINK_READY = "🔗 Ссылка на консультацию {date} (МСК):\n{link}"
+BOOKING_REMINDER = "⏰ <b>Напоминание:</b> консультация {date} (МСК)."
+BOOKING_REMINDER_LINK = "\n🔗 Ссылка: {link}"
+
 # Admin
 ADMIN_MENU = (
     "🔧 <b>Панель администратора</b>\n\n"
@@ -123,6 +131,26 @@ ADMIN_PAST_SLOT = "❌ Нельзя создать слот в прошлом."
 
 ADMIN_NO_SLOTS = "Нет доступных слотов для удаления."
 
+ADMIN_SCHEDULE_PROMPT = (
+    "🗓 <b>Слоты по расписанию</b>\n\n"
+    "Отправьте расписание одной строкой:\n"
+    "<code>&lt;дни&gt; &lt;с&gt;-&lt;до&gt; &lt;недель&gt; [длительность]</code>\n\n"
+    "Примеры:\n"
+    "<code>пн-пт 10:00-17:00 8</code> — будни, 10:00–17:00, 8 недель, по 60 мин\n"
+    "<code>пн,ср,пт 09:00-13:00 4 30</code> — по 30 мин\n"
+    "<code>ежедневно 12:00-15:00 2</code>\n\n"
+    "Праздники из настроек пропускаются. Сначала будет показан предпросмотр."
+)
+
+ADMIN_SCHEDULE_PREVIEW = (
+    "🗓 <b>Предпросмотр</b>\n\n"
+    "Будет создано: <b>{new}</b> слот(ов), {first} — {last}\n"
+    "Пропущено из-за пересечений с существующими: {conflicts}\n"
+    "Пропущено праздничных дней: {holidays}"
+)
+
+ADMIN_SCHEDULE_CREATED = "✅ Создано слотов: {new}. Пропущено пересечений: {conflicts}."
+
 TARIFF_LABELS = {
     "basic": "💚 Базовый",
     "extended": "💎 Сопровождение",
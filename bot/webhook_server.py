@@ -1,20 +1,56 @@
-"""YooKassa webhook receiver — aiohttp server for payment notifications."""
-
-import hashlib
+"""YooKassa webhook receiver — aiohttp server for payment notifications.
+
+The HTTP handler only checks the request, stores the raw notification in
+the ``webhook_inbox`` table (unique on event + payment id, so YooKassa
+retries collapse into one row) and answers 200. A small pool of workers
+claims inbox rows one at a time with a conditional UPDATE and runs the
+payment handlers, so each notification is processed exactly once however
+often it is delivered, and slow Telegram calls never hold the response.
+The notification body is not trusted: the worker asks the YooKassa API for
+the payment's actual status and acts on that; a payment YooKassa doesn't
+know is final and not retried. Processed rows are deleted by the
+``webhook_inbox_cleanup`` job after ``WEBHOOK_INBOX_RETENTION_DAYS``.
+
+In webhook mode (``TELEGRAM_WEBHOOK_URL`` set) the same application also
+receives Telegram updates through ``TelegramWebhookHandler``, so several bot
+replicas can run behind one load balancer.
+"""
+
+import asyncio
 import hmac
+import ipaddress
 import json
 import logging
+from datetime import datetime, timedelta, timezone
 from typing import Optional
+from urllib.parse import urlsplit
 
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 from aiohttp import web
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
 
+from bot import metrics
+from bot.services.payment_reconciler import payment_reconciler
+from bot.services.yookassa_service import PAYMENT_ID_RE, PaymentNotFound, get_yookassa
 from config.settings import settings
-from db.base import async_session
-from db.models import Payment, PaymentStatus
+from db.base import async_session, upsert
+from db.models import Payment, PaymentStatus, WebhookEvent
 
 logger = logging.getLogger(__name__)
 
+# https://yookassa.ru/developers/using-api/webhooks#ip
+YOOKASSA_NETWORKS = [
+    ipaddress.ip_network(net) for net in (
+        "185.71.76.0/27", "185.71.77.0/27", "77.75.153.0/25", "77.75.156.11/32",
+        "77.75.156.35/32", "77.75.154.128/25", "2a02:5180::/32",
+    )
+]
+MAX_ATTEMPTS = 5
+# A "processing" row older than this is from a crashed worker and is retried
+PROCESSING_LEASE = timedelta(minutes=5)
+# Inbox rows deleted per statement by purge_webhook_inbox()
+PURGE_BATCH = 1000
+
 # Will be set from main.py
 _bot = None
 _dp = None
@@ -26,63 +62,252 @@ def set_bot_and_dp(bot, dp):
     _dp = dp
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _client_ip(request: web.Request) -> Optional[str]:
+    remote = request.remote
+    try:
+        behind_proxy = remote is not None and ipaddress.ip_address(remote).is_private
+    except ValueError:
+        behind_proxy = False
+    if behind_proxy:
+        # nginx in front of the bot (see README) passes the real address
+        forwarded = request.headers.get("X-Real-IP") or request.headers.get("X-Forwarded-For", "").split(",")[0]
+        return forwarded.strip() or remote
+    return remote
+
+
+def _verify(request: web.Request) -> bool:
+    token = settings.YOOKASSA_WEBHOOK_URL_TOKEN
+    if token and not hmac.compare_digest(request.query.get("token", ""), token):
+        logger.warning("Webhook rejected: wrong URL token")
+        return False
+    if settings.YOOKASSA_WEBHOOK_CHECK_IP:
+        ip = _client_ip(request)
+        try:
+            allowed = ip is not None and any(ipaddress.ip_address(ip) in net for net in YOOKASSA_NETWORKS)
+        except ValueError:
+            allowed = False
+        if not allowed:
+            logger.warning(f"Webhook rejected: {ip} is not a YooKassa address")
+            return False
+    return True
+
+
 async def handle_yookassa_webhook(request: web.Request) -> web.Response:
-    """Handle incoming webhook notifications from YooKassa."""
+    """Store the notification in the inbox and acknowledge it."""
+    if not _verify(request):
+        return web.Response(status=403)
+
     try:
         body = await request.read()
         data = json.loads(body)
+        event_type = data["event"]
+        yk_payment_id = data["object"]["id"]
     except Exception:
         logger.warning("Invalid webhook body")
         return web.Response(status=400)
+    if not isinstance(yk_payment_id, str) or not PAYMENT_ID_RE.fullmatch(yk_payment_id):
+        logger.warning(f"Webhook rejected: malformed payment id {str(yk_payment_id)[:64]!r}")
+        return web.Response(status=400)
+
+    stmt = (
+        upsert(WebhookEvent)
+        .values(event=event_type, payment_id=yk_payment_id, payload=data, status="pending", attempts=0)
+        .on_conflict_do_nothing(index_elements=["event", "payment_id"])
+        .returning(WebhookEvent.id)
+    )
+    # If this fails aiohttp answers 500 and YooKassa delivers the notification again
+    async with async_session() as session:
+        event_id = (await session.execute(stmt)).scalar_one_or_none()
+        await session.commit()
+
+    if event_id is None:
+        logger.info(f"YooKassa webhook duplicate: event={event_type}, payment_id={yk_payment_id}")
+    else:
+        logger.info(f"YooKassa webhook queued: event={event_type}, payment_id={yk_payment_id}")
+        webhook_workers.wake(event_id)
+    return web.Response(status=200, text="OK")
 
-    event_type = data.get("event")
-    obj = data.get("object", {})
-    yk_payment_id = obj.get("id")
-    status = obj.get("status")
 
-    logger.info(f"YooKassa webhook: event={event_type}, payment_id={yk_payment_id}, status={status}")
+class WebhookWorkers:
+    """Bounded pool processing ``webhook_inbox`` rows."""
 
-    if event_type == "payment.succeeded" and status == "succeeded":
-        await _handle_payment_succeeded(yk_payment_id, obj)
-    elif event_type == "payment.canceled":
+    def __init__(self, workers: int = 4) -> None:
+        self.workers = workers
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    def wake(self, event_id: int) -> None:
+        self._queue.put_nowait(event_id)
+
+    async def start(self) -> None:
+        await self._recover()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"webhook-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Finish what is queued (up to ``timeout``); the rest stays pending in the inbox."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook workers stopped with {self._queue.qsize()} event(s) pending")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _recover(self) -> None:
+        """Requeue events left pending, or stuck in processing by a crashed process."""
+        async with async_session() as session:
+            await session.execute(
+                update(WebhookEvent)
+                .where(WebhookEvent.status == "processing", WebhookEvent.locked_at < _utcnow() - PROCESSING_LEASE)
+                .values(status="pending")
+            )
+            await session.commit()
+            result = await session.execute(
+                select(WebhookEvent.id).where(WebhookEvent.status == "pending").order_by(WebhookEvent.id)
+            )
+            event_ids = list(result.scalars())
+        for event_id in event_ids:
+            self.wake(event_id)
+        if event_ids:
+            logger.info(f"Recovered {len(event_ids)} pending webhook event(s)")
+
+    async def _worker(self) -> None:
+        while True:
+            event_id = await self._queue.get()
+            try:
+                await self._process(event_id)
+            except Exception as e:
+                logger.error(f"Webhook event {event_id} crashed the worker: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, event_id: int) -> None:
+        # Atomic claim: only one worker (in any process) moves a row out of "pending"
+        async with async_session() as session:
+            result = await session.execute(
+                update(WebhookEvent)
+                .where(WebhookEvent.id == event_id, WebhookEvent.status == "pending")
+                .values(status="processing", locked_at=_utcnow(), attempts=WebhookEvent.attempts + 1)
+                .returning(WebhookEvent.event, WebhookEvent.payload, WebhookEvent.attempts)
+            )
+            claimed = result.one_or_none()
+            await session.commit()
+        if claimed is None:
+            return
+        event_type, payload, attempts = claimed
+
+        error = None
+        final = False
+        try:
+            await _dispatch(event_type, payload)
+        except PaymentNotFound as e:
+            # Forged, or from another shop: asking again won't make it exist
+            error, final = e, True
+            logger.warning(f"Webhook event {event_id}: YooKassa has no such payment ({e})")
+        except Exception as e:
+            error = e
+            logger.error(f"Webhook event {event_id} failed (attempt {attempts}): {e}", exc_info=True)
+
+        if error is None:
+            values = {"status": "done", "processed_at": _utcnow(), "last_error": None}
+        elif attempts < MAX_ATTEMPTS and not final:
+            values = {"status": "pending", "last_error": str(error)}
+        else:
+            values = {"status": "failed", "processed_at": _utcnow(), "last_error": str(error)}
+        async with async_session() as session:
+            await session.execute(update(WebhookEvent).where(WebhookEvent.id == event_id).values(**values))
+            await session.commit()
+
+        if values["status"] == "pending":
+            asyncio.get_running_loop().call_later(2 ** attempts, self.wake, event_id)
+
+
+async def purge_webhook_inbox() -> int:
+    """Delete processed inbox rows older than ``WEBHOOK_INBOX_RETENTION_DAYS``; the number deleted."""
+    cutoff = _utcnow() - timedelta(days=settings.WEBHOOK_INBOX_RETENTION_DAYS)
+    total = 0
+    while True:
+        # In batches, so the first run after a long backlog doesn't hold one huge transaction
+        async with async_session() as session:
+            batch = (
+                select(WebhookEvent.id)
+                .where(WebhookEvent.status.in_(("done", "failed")), WebhookEvent.processed_at < cutoff)
+                .limit(PURGE_BATCH)
+            )
+            result = await session.execute(delete(WebhookEvent).where(WebhookEvent.id.in_(batch)))
+            await session.commit()
+        total += result.rowcount
+        if result.rowcount < PURGE_BATCH:
+            break
+    if total:
+        logger.info(f"Webhook inbox: deleted {total} processed event(s)")
+    return total
+
+
+async def _dispatch(event_type: str, data: dict) -> None:
+    yk_payment_id = data.get("object", {}).get("id")
+    # Anyone can POST a notification: act on the status YooKassa reports, not the body
+    info = await get_yookassa().get_payment_info(yk_payment_id, raise_not_found=True)
+    if info is None:
+        # Raise so the inbox retries; the reconciler also catches up later
+        raise RuntimeError(f"Cannot confirm payment {yk_payment_id} with YooKassa")
+    logger.info(f"YooKassa event: event={event_type}, payment_id={yk_payment_id}, status={info['status']}")
+    # "Check payment" presses are answered from memory from now on
+    payment_reconciler.statuses.put(info)
+
+    if info["status"] == "succeeded" and info["paid"]:
+        await _handle_payment_succeeded(yk_payment_id, info)
+    elif info["status"] == "canceled":
         await _handle_payment_cancelled(yk_payment_id)
+    else:
+        logger.warning(f"Ignoring {event_type} for {yk_payment_id}: YooKassa reports {info['status']}")
 
-    # Always respond 200 to acknowledge receipt
-    return web.Response(status=200, text="OK")
+
+async def mark_payment_succeeded(session, yk_payment_id: str, payment_method_type: str) -> Optional[int]:
+    """Move a payment to ``succeeded`` and commit; the user id if this call made the change.
+
+    A conditional UPDATE, so the webhook, the reconciler and the "check
+    payment" button can race on one payment and only one of them wins.
+    """
+    result = await session.execute(
+        update(Payment)
+        .where(Payment.yookassa_payment_id == yk_payment_id, Payment.status != PaymentStatus.succeeded)
+        .values(status=PaymentStatus.succeeded, payment_method_type=payment_method_type, paid_at=_utcnow())
+        .returning(Payment.user_id)
+    )
+    user_id = result.scalar_one_or_none()
+    await session.commit()
+    return user_id
 
 
 async def _handle_payment_succeeded(yk_payment_id: str, payment_obj: dict):
     """Payment confirmed — update DB and notify user to continue."""
     if not _bot:
-        logger.error("Bot not initialized for webhook handler")
-        return
+        # Raise so the inbox retries once the bot is up
+        raise RuntimeError("Bot not initialized for webhook handler")
 
     async with async_session() as session:
-        # Find payment by YooKassa ID
-        result = await session.execute(
-            select(Payment).where(Payment.yookassa_payment_id == yk_payment_id)
-        )
-        payment = result.scalar_one_or_none()
-
-        if not payment:
-            logger.warning(f"Payment not found in DB for YooKassa ID: {yk_payment_id}")
-            return
-
-        if payment.status == PaymentStatus.succeeded:
-            logger.info(f"Payment {yk_payment_id} already marked as succeeded")
+        payment_method = payment_obj.get("payment_method") or {}
+        user_id = await mark_payment_succeeded(session, yk_payment_id, payment_method.get("type", "unknown"))
+        if user_id is None:
+            logger.info(f"Payment {yk_payment_id} not found or already marked as succeeded")
             return
 
-        # Update payment status
-        payment.status = PaymentStatus.succeeded
-        payment_method = payment_obj.get("payment_method", {})
-        payment.payment_method_type = payment_method.get("type", "unknown")
-        await session.commit()
-
         # Get user's telegram_id
         from db.models import User
-        user = await session.get(User, payment.user_id)
+        user = await session.get(User, user_id)
         if not user:
-            logger.error(f"User not found for payment {payment.id}")
+            logger.error(f"User not found for payment {yk_payment_id}")
             return
 
         telegram_id = user.telegram_id
@@ -97,7 +322,6 @@ async def _handle_payment_succeeded(yk_payment_id: str, payment_obj: dict):
         )
 
         # Update FSM state for this user
-        from aiogram.fsm.storage.memory import MemoryStorage
         storage = _dp.storage
         from aiogram.fsm.storage.base import StorageKey
         key = StorageKey(bot_id=_bot.id, chat_id=telegram_id, user_id=telegram_id)
@@ -111,36 +335,111 @@ async def _handle_payment_succeeded(yk_payment_id: str, payment_obj: dict):
         logger.error(f"Failed to notify user {telegram_id}: {e}", exc_info=True)
 
 
-async def _handle_payment_cancelled(yk_payment_id: str):
-    """Payment cancelled — update DB."""
+async def _handle_payment_cancelled(yk_payment_id: str, expired: bool = False):
+    """Payment cancelled (or abandoned until it expired) — update DB and tell the user."""
+    from bot import texts
     async with async_session() as session:
         result = await session.execute(
-            select(Payment).where(Payment.yookassa_payment_id == yk_payment_id)
+            update(Payment)
+            .where(Payment.yookassa_payment_id == yk_payment_id, Payment.status == PaymentStatus.pending)
+            .values(status=PaymentStatus.cancelled)
+            .returning(Payment.user_id)
         )
-        payment = result.scalar_one_or_none()
-
-        if payment and payment.status == PaymentStatus.pending:
-            payment.status = PaymentStatus.cancelled
-            await session.commit()
+        user_id = result.scalar_one_or_none()
+        await session.commit()
 
+        if user_id is not None:
             from db.models import User
-            user = await session.get(User, payment.user_id)
+            user = await session.get(User, user_id)
             if user and _bot:
                 try:
                     await _bot.send_message(
-                        user.telegram_id,
-                        "❌ Оплата отменена. Используйте /start чтобы начать заново.",
+                        user.telegram_id, texts.PAYMENT_EXPIRED if expired else texts.PAYMENT_CANCELLED,
                     )
                 except Exception as e:
                     logger.error(f"Failed to notify user about cancellation: {e}")
 
-    logger.info(f"Payment {yk_payment_id} cancelled")
+    logger.info(f"Payment {yk_payment_id} {'expired' if expired else 'cancelled'}")
+
+
+telegram_updates_in_flight = metrics.Gauge(
+    "telegram_updates_in_flight", "Telegram webhook updates being processed",
+)
+
+
+class TelegramWebhookHandler(SimpleRequestHandler):
+    """aiogram's webhook handler with a cap on concurrent updates and a graceful drain.
+
+    Updates are acknowledged at once and processed in the background, at most
+    ``max_concurrency`` at a time; past that the request waits for a free
+    slot, which slows Telegram down instead of piling up tasks. ``drain()``
+    stops accepting updates (503, so Telegram redelivers them, possibly to
+    another replica) and waits for the ones in progress.
+    """
 
+    def __init__(self, dispatcher, bot, max_concurrency: int = 50, **kwargs) -> None:
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.draining = False
 
-def create_webhook_app() -> web.Application:
-    """Create aiohttp application for YooKassa webhooks."""
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.draining:
+            return web.Response(status=503)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), self.bot):
+            return web.Response(body="Unauthorized", status=401)
+        update = await request.json(loads=self.bot.session.json_loads)
+
+        await self._semaphore.acquire()
+        telegram_updates_in_flight.inc()
+        task = asyncio.create_task(self._background_feed_update(bot=self.bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._update_done)
+        return web.json_response({}, dumps=self.bot.session.json_dumps)
+
+    async def drain(self, timeout: float) -> None:
+        self.draining = True
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logger.info(f"Draining {len(tasks)} Telegram update(s)")
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Cancelled {len(pending)} Telegram update(s) still running after {timeout}s")
+
+    async def close(self) -> None:
+        # The bot session outlives the app: background workers still send messages
+        pass
+
+    def _update_done(self, task: asyncio.Task) -> None:
+        self._background_feed_update_tasks.discard(task)
+        self._semaphore.release()
+        telegram_updates_in_flight.dec()
+        if not task.cancelled() and task.exception():
+            logger.error(f"Telegram update failed: {task.exception()!r}")
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+def create_webhook_app(telegram_handler: Optional[TelegramWebhookHandler] = None) -> web.Application:
+    """Create aiohttp application for YooKassa (and, optionally, Telegram) webhooks."""
     app = web.Application()
     app.router.add_post("/webhook/yookassa", handle_yookassa_webhook)
-    # Health check endpoint
-    app.router.add_get("/health", lambda r: web.Response(text="OK"))
+    if telegram_handler is not None:
+        telegram_handler.register(app, path=urlsplit(settings.TELEGRAM_WEBHOOK_URL).path or "/")
+
+    # Health check endpoint: 503 while draining, so the load balancer stops routing here
+    async def health(request: web.Request) -> web.Response:
+        if telegram_handler is not None and telegram_handler.draining:
+            return web.Response(status=503, text="draining")
+        return web.Response(text="OK")
+
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", handle_metrics)
     return app
+
+
+webhook_workers = WebhookWorkers()
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
+from config.settings import settings
 from db.base import Base
 from db.models import *  # noqa: F401 F403 — import all models so they register
 
@@ -13,6 +14,10 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Same database as the bot (alembic.ini's URL only works outside docker);
+# `alembic -x url=...` overrides it
+config.set_main_option("sqlalchemy.url", context.get_x_argument(as_dictionary=True).get("url", settings.DATABASE_URL))
+
 target_metadata = Base.metadata
 
 
@@ -0,0 +1,46 @@
+"""Indexes for hot queries: webhook payment lookup, slot picker, FK joins
+
+Tables themselves are created by ``Base.metadata.create_all`` at bot startup,
+so this revision only adds indexes to existing tables; ``if_not_exists`` makes
+it a no-op on databases created after the models already declared them.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_payments_yookassa_payment_id", "payments", ["yookassa_payment_id"],
+        unique=True, if_not_exists=True,
+    )
+    op.create_index("ix_payments_user_id", "payments", ["user_id"], if_not_exists=True)
+    op.create_index("ix_bookings_user_id", "bookings", ["user_id"], if_not_exists=True)
+    op.create_index("ix_bookings_payment_id", "bookings", ["payment_id"], if_not_exists=True)
+    op.create_index("ix_bookings_slot_id", "bookings", ["slot_id"], if_not_exists=True)
+    op.create_index(
+        "ix_slots_available", "slots", ["datetime_utc"],
+        postgresql_where=sa.text("is_booked = false AND is_deleted = false"),
+        sqlite_where=sa.text("is_booked = 0 AND is_deleted = 0"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_slots_available", table_name="slots", if_exists=True)
+    op.drop_index("ix_bookings_slot_id", table_name="bookings", if_exists=True)
+    op.drop_index("ix_bookings_payment_id", table_name="bookings", if_exists=True)
+    op.drop_index("ix_bookings_user_id", table_name="bookings", if_exists=True)
+    op.drop_index("ix_payments_user_id", table_name="payments", if_exists=True)
+    op.drop_index("ix_payments_yookassa_payment_id", table_name="payments", if_exists=True)
@@ -0,0 +1,23 @@
+"""Index for keyset-paginated admin booking history
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_bookings_created_at_id", "bookings", ["created_at", "id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bookings_created_at_id", table_name="bookings", if_exists=True)
@@ -0,0 +1,35 @@
+"""Content hash of photos in the content-addressed store
+
+Databases created by ``create_all`` after the model gained the column
+already have it, so the column is only added when missing.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not _has_column("photos", "content_hash"):
+        op.add_column("photos", sa.Column("content_hash", sa.String(64), nullable=True))
+    op.create_index("ix_photos_content_hash", "photos", ["content_hash"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_photos_content_hash", table_name="photos", if_exists=True)
+    if _has_column("photos", "content_hash"):
+        op.drop_column("photos", "content_hash")
@@ -0,0 +1,37 @@
+"""Photo retention: purged_at and an index over unpurged photos by upload time
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not _has_column("photos", "purged_at"):
+        op.add_column("photos", sa.Column("purged_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_photos_unpurged_uploaded_at", "photos", ["uploaded_at"],
+        postgresql_where=sa.text("purged_at IS NULL"),
+        sqlite_where=sa.text("purged_at IS NULL"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_photos_unpurged_uploaded_at", table_name="photos", if_exists=True)
+    if _has_column("photos", "purged_at"):
+        op.drop_column("photos", "purged_at")
@@ -0,0 +1,30 @@
+"""Booking reminders: reminder_sent_at
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not _has_column("bookings", "reminder_sent_at"):
+        op.add_column("bookings", sa.Column("reminder_sent_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_column("bookings", "reminder_sent_at"):
+        op.drop_column("bookings", "reminder_sent_at")
@@ -0,0 +1,30 @@
+"""Conference links: link_claimed_at, so one process creates each link
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if not _has_column("bookings", "link_claimed_at"):
+        op.add_column("bookings", sa.Column("link_claimed_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_column("bookings", "link_claimed_at"):
+        op.drop_column("bookings", "link_claimed_at")
@@ -0,0 +1,32 @@
+"""Slot picker: index on the day of available slots
+
+The day picker pages over distinct ``date(datetime_utc)`` values; this
+index returns them in order, so a page reads only its own days.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_slots_available_day", "slots", [sa.text("date(datetime_utc)"), "datetime_utc"],
+        postgresql_where=sa.text("is_booked = false AND is_deleted = false"),
+        sqlite_where=sa.text("is_booked = 0 AND is_deleted = 0"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_slots_available_day", table_name="slots", if_exists=True)
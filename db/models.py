@@ -2,8 +2,8 @@ import enum
 from datetime import datetime
 
 from sqlalchemy import (
-    BigInteger, Boolean, DateTime, Enum, Float, ForeignKey,
-    Integer, String, Text, func,
+    JSON, BigInteger, Boolean, DateTime, Enum, Float, ForeignKey,
+    Index, Integer, String, Text, UniqueConstraint, func, text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -50,9 +50,9 @@ class Payment(Base):
     __tablename__ = "payments"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     tariff: Mapped[TariffType] = mapped_column(Enum(TariffType))
-    yookassa_payment_id: Mapped[str | None] = mapped_column(String(255))
+    yookassa_payment_id: Mapped[str | None] = mapped_column(String(255), unique=True, index=True)
     amount: Mapped[float] = mapped_column(Float)
     currency: Mapped[str] = mapped_column(String(10), default="RUB")
     status: Mapped[PaymentStatus] = mapped_column(Enum(PaymentStatus), default=PaymentStatus.pending)
@@ -66,6 +66,15 @@ class Payment(Base):
 
 class Slot(Base):
     __tablename__ = "slots"
+    __table_args__ = (
+        # Slot picker: future slots that are neither booked nor deleted
+        Index(
+            "ix_slots_available",
+            "datetime_utc",
+            postgresql_where=text("is_booked = false AND is_deleted = false"),
+            sqlite_where=text("is_booked = 0 AND is_deleted = 0"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     datetime_utc: Mapped[datetime] = mapped_column(DateTime, index=True)
@@ -78,17 +87,35 @@ class Slot(Base):
     booking: Mapped["Booking | None"] = relationship(back_populates="slot")
 
 
+# Day picker: distinct days with free slots, in day order (slot_service._load_days_page)
+Index(
+    "ix_slots_available_day",
+    func.date(Slot.datetime_utc),
+    Slot.datetime_utc,
+    postgresql_where=text("is_booked = false AND is_deleted = false"),
+    sqlite_where=text("is_booked = 0 AND is_deleted = 0"),
+)
+
+
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Admin history: keyset pagination on (created_at, id)
+        Index("ix_bookings_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    payment_id: Mapped[int] = mapped_column(ForeignKey("payments.id"))
-    slot_id: Mapped[int] = mapped_column(ForeignKey("slots.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    payment_id: Mapped[int] = mapped_column(ForeignKey("payments.id"), index=True)
+    slot_id: Mapped[int] = mapped_column(ForeignKey("slots.id"), index=True)
     tariff: Mapped[TariffType] = mapped_column(Enum(TariffType))
     status: Mapped[BookingStatus] = mapped_column(Enum(BookingStatus), default=BookingStatus.active)
     conference_link: Mapped[str | None] = mapped_column(String(500))
+    # Set while a process is creating the conference link (see conference_links.py)
+    link_claimed_at: Mapped[datetime | None] = mapped_column(DateTime)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    # Set when the "consultation soon" reminder has been sent
+    reminder_sent_at: Mapped[datetime | None] = mapped_column(DateTime)
 
     user: Mapped["User"] = relationship(back_populates="bookings")
     payment: Mapped["Payment"] = relationship(back_populates="booking")
@@ -113,11 +140,57 @@ class QuestionnaireAnswer(Base):
 
 class Photo(Base):
     __tablename__ = "photos"
+    __table_args__ = (
+        # Retention: expired photos whose file is still on disk
+        Index(
+            "ix_photos_unpurged_uploaded_at",
+            "uploaded_at",
+            postgresql_where=text("purged_at IS NULL"),
+            sqlite_where=text("purged_at IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     booking_id: Mapped[int] = mapped_column(ForeignKey("bookings.id"), index=True)
     file_path: Mapped[str] = mapped_column(String(500))
     telegram_file_id: Mapped[str | None] = mapped_column(String(255))
+    # SHA-256 of the file in the content-addressed store; rows sharing it share the file
+    content_hash: Mapped[str | None] = mapped_column(String(64), index=True)
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    # Set when retention removed the file; the row is kept for the booking's history
+    purged_at: Mapped[datetime | None] = mapped_column(DateTime)
 
     booking: Mapped["Booking"] = relationship(back_populates="photos")
+
+
+class FsmRecord(Base):
+    """Persistent aiogram FSM state + data, one row per storage key."""
+
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(255))
+    data: Mapped[dict] = mapped_column(JSON, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class WebhookEvent(Base):
+    """Inbox of YooKassa notifications — stored on receipt, processed by workers."""
+
+    __tablename__ = "webhook_inbox"
+    __table_args__ = (
+        # YooKassa retries deliver the same (event, payment) again
+        UniqueConstraint("event", "payment_id", name="uq_webhook_inbox_event_payment"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    event: Mapped[str] = mapped_column(String(64))
+    payment_id: Mapped[str] = mapped_column(String(255))
+    payload: Mapped[dict] = mapped_column(JSON)
+    # pending -> processing -> done | failed
+    status: Mapped[str] = mapped_column(String(20), default="pending", index=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text)
+    received_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    locked_at: Mapped[datetime | None] = mapped_column(DateTime)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime)
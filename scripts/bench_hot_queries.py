@@ -0,0 +1,148 @@
+"""Benchmark hot queries with and without the indexes from migration 0001.
+
+Seeds 1M payments / 100k slots into a throw-away schema of the Postgres
+database in DATABASE_URL, times each query without the new indexes, creates
+them, and times again. The schema is dropped afterwards unless --keep.
+
+    python scripts/bench_hot_queries.py [--payments 1000000] [--slots 100000] [--runs 50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config.settings import settings
+from db.base import Base
+from db import models  # noqa: F401 — register all models
+
+SCHEMA = "bench_hot_queries"
+
+# Indexes added in migration 0001 — dropped for the "before" run
+NEW_INDEXES = {
+    "payments": ["ix_payments_yookassa_payment_id", "ix_payments_user_id"],
+    "bookings": ["ix_bookings_user_id", "ix_bookings_payment_id", "ix_bookings_slot_id"],
+    "slots": ["ix_slots_available"],
+}
+
+QUERIES = {
+    "webhook: payment by yookassa id": (
+        "SELECT * FROM payments WHERE yookassa_payment_id = :yk_id",
+        lambda n: {"yk_id": f"yk-{n // 2}"},
+    ),
+    "slot picker: available future slots": (
+        "SELECT * FROM slots WHERE is_booked = false AND is_deleted = false "
+        "AND datetime_utc > now() AT TIME ZONE 'utc' ORDER BY datetime_utc",
+        lambda n: {},
+    ),
+    "bookings of a user": (
+        "SELECT * FROM bookings WHERE user_id = :user_id",
+        lambda n: {"user_id": 4242},
+    ),
+    "payments of a user": (
+        "SELECT * FROM payments WHERE user_id = :user_id",
+        lambda n: {"user_id": 4242},
+    ),
+}
+
+
+def _indexes(tables):
+    for table in tables.values():
+        for index in table.indexes:
+            if index.name in NEW_INDEXES.get(table.name, []):
+                yield index
+
+
+async def seed(conn, payments: int, slots: int) -> None:
+    users = max(payments // 10, 1)
+    await conn.execute(text(
+        "INSERT INTO users (id, telegram_id, first_name, created_at, updated_at) "
+        "SELECT g, 100000000 + g, 'user' || g, now(), now() FROM generate_series(1, :n) g"
+    ), {"n": users})
+    await conn.execute(text(
+        "INSERT INTO payments (id, user_id, tariff, yookassa_payment_id, amount, currency, status, created_at) "
+        "SELECT g, 1 + g % :users, 'basic', 'yk-' || g, 8000, 'RUB', "
+        "CASE WHEN g % 5 = 0 THEN 'pending' ELSE 'succeeded' END::paymentstatus, now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": payments, "users": users})
+    # Two thirds of slots are in the past, most of the rest are already booked
+    await conn.execute(text(
+        "INSERT INTO slots (id, datetime_utc, duration_minutes, is_booked, is_deleted, created_at) "
+        "SELECT g, (now() AT TIME ZONE 'utc') - interval '1 hour' * (:n * 2 / 3 - g), 60, "
+        "g % 10 <> 0, g % 50 = 0, now() FROM generate_series(1, :n) g"
+    ), {"n": slots})
+    await conn.execute(text(
+        "INSERT INTO bookings (id, user_id, payment_id, slot_id, tariff, status, created_at) "
+        "SELECT g, 1 + g % :users, g, g, 'basic', 'active', now() "
+        "FROM generate_series(1, :n) g WHERE g % 10 <> 0"
+    ), {"n": slots, "users": users})
+    await conn.execute(text("ANALYZE"))
+
+
+async def measure(conn, runs: int) -> dict[str, float]:
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        timings = []
+        for n in range(runs):
+            started = time.perf_counter()
+            await conn.execute(text(sql), params(n * 7919))
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+
+async def main(args) -> None:
+    if not settings.DATABASE_URL.startswith("postgresql"):
+        sys.exit("This benchmark needs PostgreSQL (generate_series, partial indexes)")
+
+    engine = create_async_engine(
+        settings.DATABASE_URL,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            await conn.run_sync(Base.metadata.create_all)
+            for index in _indexes(Base.metadata.tables):
+                await conn.run_sync(index.drop)
+            print(f"Seeding {args.payments} payments, {args.slots} slots...")
+            await seed(conn, args.payments, args.slots)
+
+        async with engine.connect() as conn:
+            before = await measure(conn, args.runs)
+
+        async with engine.begin() as conn:
+            for index in _indexes(Base.metadata.tables):
+                await conn.run_sync(index.create)
+            await conn.execute(text("ANALYZE"))
+
+        async with engine.connect() as conn:
+            after = await measure(conn, args.runs)
+
+        width = max(len(name) for name in QUERIES)
+        print(f"\n{'query':<{width}}  {'before, ms':>11}  {'after, ms':>10}  {'speedup':>8}")
+        for name in QUERIES:
+            speedup = before[name] / after[name] if after[name] else float("inf")
+            print(f"{name:<{width}}  {before[name]:>11.3f}  {after[name]:>10.3f}  {speedup:>7.1f}x")
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=1_000_000)
+    parser.add_argument("--slots", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded schema")
+    asyncio.run(main(parser.parse_args()))
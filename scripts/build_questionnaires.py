@@ -0,0 +1,15 @@
+"""Compile the questionnaire .md specs into questionnaires.bundle.json."""
+
+import sys
+import os
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bot.services.questionnaire_registry import registry
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    registry.load()
+    print(f"Bundle written to {registry.bundle_path}")
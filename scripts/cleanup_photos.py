@@ -1,13 +1,23 @@
-"""Cron script for cleaning up old uploaded photos."""
+"""Clean up old uploaded photos now.
 
+The bot runs the same job on its scheduler (``PHOTO_CLEANUP_CRON``); this
+script is for running it by hand.
+"""
+
+import asyncio
 import sys
 import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from bot.services.photo_service import PhotoService
+from bot.services.photo_service import cleanup_photos
+
+
+async def main() -> None:
+    purged, swept = await cleanup_photos()
+    print(f"Purged {purged.rows} expired photo(s), removed {purged.files} file(s).")
+    print(f"Removed {swept} file(s) left by unfinished bookings.")
 
 
 if __name__ == "__main__":
-    removed = PhotoService.cleanup_old_photos()
-    print(f"Removed {removed} old photo(s).")
+    asyncio.run(main())
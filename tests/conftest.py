@@ -0,0 +1,8 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# config.settings refuses to load without these
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
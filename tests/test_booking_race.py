@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from bot.services.booking_service import BookingService
+from bot.services.conference_links import conference_links
+from db.base import Base
+from db.models import Booking, Payment, PaymentStatus, Slot, TariffType, User
+
+USERS = 20
+
+
+async def _race(url):
+    engine = create_async_engine(url, connect_args={"timeout": 30})
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with sessionmaker() as session:
+        users = [User(telegram_id=1000 + i) for i in range(USERS)]
+        session.add_all(users)
+        await session.flush()
+        payments = [
+            Payment(user_id=u.id, tariff=TariffType.basic, amount=0, status=PaymentStatus.succeeded)
+            for u in users
+        ]
+        slot = Slot(datetime_utc=datetime(2100, 1, 1), duration_minutes=60)
+        session.add_all([*payments, slot])
+        await session.commit()
+
+    async def attempt(user, payment):
+        async with sessionmaker() as session:
+            try:
+                booking = await BookingService(session).create_booking(
+                    user_id=user.id, payment_id=payment.id, slot_id=slot.id, tariff=TariffType.basic,
+                )
+            except OperationalError:
+                # A lost race may surface as "database is locked" — still not a winner
+                return False
+            return booking is not None
+
+    try:
+        results = await asyncio.gather(*(attempt(u, p) for u, p in zip(users, payments)))
+        async with sessionmaker() as session:
+            rows = await session.scalar(
+                select(func.count()).select_from(Booking).where(Booking.slot_id == slot.id)
+            )
+    finally:
+        await engine.dispose()
+    return sum(results), rows
+
+
+def test_concurrent_bookings_of_one_slot_have_one_winner(tmp_path, monkeypatch):
+    # The winner's link would be created by the background worker, which isn't running
+    monkeypatch.setattr(conference_links, "enqueue", lambda *args: None)
+
+    winners, rows = asyncio.run(_race(f"sqlite+aiosqlite:///{tmp_path / 'race.db'}"))
+
+    assert winners == 1
+    assert rows == 1
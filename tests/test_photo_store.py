@@ -0,0 +1,52 @@
+import asyncio
+import hashlib
+from datetime import date
+
+from aiogram import Bot
+from aiogram.types import File
+
+from bot.services.photo_store import PhotoStore
+
+
+def _fake_bot(chunks):
+    """A real Bot whose Telegram calls are replaced: get_file and the file stream."""
+    bot = Bot("123456:test")
+
+    async def get_file(file_id, **kwargs):
+        return File(file_id=file_id, file_unique_id=f"u-{file_id}", file_path="photos/file_0.jpg")
+
+    async def stream_content(url, **kwargs):
+        for chunk in chunks:
+            yield chunk
+
+    bot.get_file = get_file
+    bot.session.stream_content = stream_content
+    return bot
+
+
+def test_download_stores_object_by_content_hash(tmp_path):
+    chunks = [b"\xff\xd8first-chunk", b"second-chunk", b"\xff\xd9"]
+    data = b"".join(chunks)
+    store = PhotoStore(tmp_path)
+
+    stored = asyncio.run(store.download(_fake_bot(chunks), "file-1"))
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert stored.content_hash == digest
+    assert stored.path == store.path_for(digest)
+    assert stored.path.read_bytes() == data
+    assert not stored.deduplicated
+    assert (store.pending_dir / date.today().isoformat() / digest).exists()
+    assert list(store.tmp_dir.iterdir()) == []
+
+
+def test_download_single_chunk_and_dedup(tmp_path):
+    store = PhotoStore(tmp_path)
+
+    first = asyncio.run(store.download(_fake_bot([b"one-chunk"]), "file-1"))
+    second = asyncio.run(store.download(_fake_bot([b"one-chunk"]), "file-2"))
+
+    assert second.content_hash == first.content_hash
+    assert second.deduplicated
+    assert first.path.read_bytes() == b"one-chunk"
+    assert list(store.tmp_dir.iterdir()) == []